@@ -0,0 +1,285 @@
+import argparse
+import logging
+import mmap
+import os
+import sys
+
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from json import dump, loads
+from pathlib import Path
+from typing import List, Tuple
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+logger = logging.getLogger()
+
+# Layout of the event logs written by SimulationEventLogging (JSON with indent=2)
+EVENTS_START = b'\n  "events": ['
+EVENTS_END = b'\n  "entities": ['
+EVENT_START = b"\n    {"
+
+
+class EventLogReport:
+    """
+    Standard reports of an event log, updated one event at a time.
+    Reports of consecutive parts of an event log can be merged.
+    """
+
+    def __init__(self):
+        self.events = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+        self.step_jobs = Counter()
+        self.step_devices = Counter()
+
+        # Busy time per resource (location), from arrival of a lot until its transformation
+        self.busy_time = defaultdict(float)
+        self.open_arrivals = {}
+        self.leading_finishes = {}
+
+        # First appearance and last packing time per lot
+        self.lot_start = {}
+        self.lot_packed = {}
+
+        self.merges = 0
+        self.splits = 0
+        self.packing_units = 0
+        self.packed_quality = Counter()
+
+    def update(self, event: dict):
+        t = event["timestamp"]
+        self.events += 1
+        if self.first_timestamp is None:
+            self.first_timestamp = t
+        self.last_timestamp = t
+
+        event_type = event["eventType"]
+        biz_step = event.get("bizStep")
+        if biz_step == "creating_class_instance":
+            if event["quantity"]["class"][1].startswith("lotModel/"):
+                self.lot_start.setdefault(event["entity"], t)
+
+        elif biz_step == "arriving":
+            self.open_arrivals[event["location"]] = t
+
+        elif event_type == "Transformation":
+            location = event["location"]
+            if location in self.open_arrivals:
+                self.busy_time[location] += t - self.open_arrivals.pop(location)
+            else:
+                # Arrival is part of a previous report
+                self.leading_finishes.setdefault(location, t)
+
+            step = event.get("capability")
+            if step is None:
+                # Event logs without capability, the step is the last operation of the lot model
+                step = (
+                    event["outputQuantity"]["class"][1].split("/", 1)[1].split("-")[-1]
+                )
+            self.step_jobs[step] += 1
+            self.step_devices[step] += event["outputQuantity"]["amount"]
+
+        elif event_type == "Aggregation":
+            if biz_step == "packing":
+                self.packing_units += 1
+                for lot in event["childEntity"]:
+                    self.lot_packed[lot] = t
+                for device in event["_devices"]:
+                    self.packed_quality[device["quality"]] += 1
+            elif event["action"] == "ADD":
+                self.merges += 1
+            else:
+                self.splits += 1
+                for lot in event["childEntity"]:
+                    self.lot_start.setdefault(lot, t)
+
+    def merge(self, other: "EventLogReport"):
+        """
+        Merges the report of the next part of the event log into this report.
+        """
+        if other.events == 0:
+            return
+        if self.first_timestamp is None:
+            self.first_timestamp = other.first_timestamp
+        self.last_timestamp = other.last_timestamp
+        self.events += other.events
+
+        self.step_jobs.update(other.step_jobs)
+        self.step_devices.update(other.step_devices)
+
+        for location, t in other.leading_finishes.items():
+            if location in self.open_arrivals:
+                self.busy_time[location] += t - self.open_arrivals.pop(location)
+            else:
+                self.leading_finishes.setdefault(location, t)
+        for location, busy in other.busy_time.items():
+            self.busy_time[location] += busy
+        self.open_arrivals.update(other.open_arrivals)
+
+        for lot, t in other.lot_start.items():
+            self.lot_start.setdefault(lot, t)
+        self.lot_packed.update(other.lot_packed)
+
+        self.merges += other.merges
+        self.splits += other.splits
+        self.packing_units += other.packing_units
+        self.packed_quality.update(other.packed_quality)
+
+    def to_dict(self) -> dict:
+        duration = (
+            self.last_timestamp - self.first_timestamp if self.events else 0
+        ) or 1
+
+        cycle_times = [
+            t - self.lot_start[lot]
+            for lot, t in self.lot_packed.items()
+            if lot in self.lot_start
+        ]
+        packed_devices = sum(self.packed_quality.values())
+
+        return {
+            "events": self.events,
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+            "throughput_per_step": {
+                step: {
+                    "jobs": jobs,
+                    "devices": self.step_devices[step],
+                    "devices_per_time_unit": self.step_devices[step] / duration,
+                }
+                for step, jobs in sorted(self.step_jobs.items())
+            },
+            "resource_utilization": {
+                location: busy / duration
+                for location, busy in sorted(self.busy_time.items())
+            },
+            "lot_cycle_time": {
+                "lots": len(cycle_times),
+                "mean": sum(cycle_times) / len(cycle_times) if cycle_times else None,
+                "min": min(cycle_times, default=None),
+                "max": max(cycle_times, default=None),
+            },
+            "merges": self.merges,
+            "splits": self.splits,
+            "packing_units": self.packing_units,
+            "packing_yield": {
+                "packed_devices": packed_devices,
+                "devices_per_quality": {
+                    str(quality): n
+                    for quality, n in sorted(self.packed_quality.items())
+                },
+                "yield": (
+                    self.packed_quality[1] / packed_devices if packed_devices else None
+                ),
+            },
+        }
+
+
+def get_event_range(event_log: mmap.mmap) -> Tuple[int, int]:
+    start = event_log.find(EVENTS_START)
+    end = event_log.rfind(EVENTS_END)
+    if start < 0 or end < 0:
+        raise ValueError("Event log is not in the layout written by the simulation")
+    return start + len(EVENTS_START), end
+
+
+def split_event_range(
+    event_log: mmap.mmap, start: int, end: int, n_parts: int
+) -> List[Tuple[int, int]]:
+    """
+    Splits the byte range of the events into parts that start at an event.
+    """
+    offsets = [start]
+    for i in range(1, n_parts):
+        offset = event_log.find(EVENT_START, start + (end - start) * i // n_parts, end)
+        if offset < 0:
+            break
+        if offset > offsets[-1]:
+            offsets.append(offset)
+    offsets.append(end)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def iterate_events(event_log: mmap.mmap, start: int, end: int):
+    """
+    Parses the events in the byte range one at a time.
+    """
+    offset = event_log.find(EVENT_START, start, end)
+    while 0 <= offset < end:
+        next_offset = event_log.find(EVENT_START, offset + 1, end)
+        event_end = next_offset if next_offset >= 0 else end
+        event_bytes = event_log[offset:event_end].rstrip().rstrip(b",]").rstrip()
+        yield loads(event_bytes)
+        offset = next_offset
+
+
+def analyze_range(event_log_file: str, start: int, end: int) -> EventLogReport:
+    report = EventLogReport()
+    with open(event_log_file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as event_log:
+            for event in iterate_events(event_log, start, end):
+                report.update(event)
+    return report
+
+
+def analyze(event_log_file: str, processes: int = None) -> dict:
+    """
+    Computes the standard reports of an event log written by the simulation, the events
+    are parsed incrementally from the memory-mapped file by one or more processes.
+    """
+    processes = processes or os.cpu_count()
+    with open(event_log_file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as event_log:
+            start, end = get_event_range(event_log)
+            ranges = split_event_range(event_log, start, end, processes)
+
+    if len(ranges) == 1:
+        reports = [analyze_range(event_log_file, *ranges[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            reports = list(
+                executor.map(
+                    analyze_range,
+                    [event_log_file] * len(ranges),
+                    [r[0] for r in ranges],
+                    [r[1] for r in ranges],
+                )
+            )
+
+    report = reports[0]
+    for other in reports[1:]:
+        report.merge(other)
+    return report.to_dict()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="assembly_simulation_analyze",
+        description="Compute standard reports of a simulation event log.\n"
+        "Events are parsed one at a time, memory grows with the number of lots (start and\n"
+        "packing time per lot for the cycle times), not with the number of events.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument("event_log_file", help="Path to the event log (JSON) file.")
+    parser.add_argument(
+        "-p",
+        "--processes",
+        help="Number of processes (default: number of cores).",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-o", "--output_file", help="Name/path of the output JSON file.", default=None
+    )
+
+    args = parser.parse_args()
+
+    report = analyze(args.event_log_file, processes=args.processes)
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            dump(report, f, indent=2)
+    else:
+        dump(report, sys.stdout, indent=2)
@@ -0,0 +1,241 @@
+import argparse
+import logging
+import sys
+
+from json import dump, load
+from math import atan, cos, pi, sin, sqrt
+from pathlib import Path
+from statistics import mean, stdev
+from typing import Dict, List
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+logger = logging.getLogger()
+
+from aggregated_event_data.simulate import simulate
+
+
+def student_t_cdf(t: float, df: int) -> float:
+    """
+    Cumulative distribution function of the Student t-distribution with an integer number of
+    degrees of freedom, in closed form (Abramowitz and Stegun 26.7.3 and 26.7.4).
+    """
+    theta = atan(abs(t) / sqrt(df))
+    cos2 = cos(theta) ** 2
+    term = total = 1.0
+    if df % 2 == 0:
+        for k in range(1, df // 2):
+            term *= (2 * k - 1) / (2 * k) * cos2
+            total += term
+        a = sin(theta) * total
+    else:
+        for k in range(1, (df - 1) // 2):
+            term *= 2 * k / (2 * k + 1) * cos2
+            total += term
+        a = 2 / pi * (theta + (sin(theta) * cos(theta) * total if df > 1 else 0))
+    return 0.5 + a / 2 if t >= 0 else 0.5 - a / 2
+
+
+def student_t_quantile(p: float, df: int) -> float:
+    """
+    Quantile of the Student t-distribution, by bisection of the cumulative distribution function.
+    """
+    if p < 0.5:
+        return -student_t_quantile(1 - p, df)
+    low, high = 0.0, 1.0
+    while student_t_cdf(high, df) < p:
+        low, high = high, 2 * high
+    for _ in range(100):
+        middle = (low + high) / 2
+        if student_t_cdf(middle, df) < p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def confidence_interval(values: List[float], confidence: float = 0.95) -> dict:
+    n = len(values)
+    if n < 2:
+        return {"mean": mean(values), "half_width": None, "n": n}
+    t = student_t_quantile(1 - (1 - confidence) / 2, n - 1)
+    return {"mean": mean(values), "half_width": t * stdev(values) / sqrt(n), "n": n}
+
+
+def run_replication(
+    config: dict,
+    runtime: int,
+    logging_id: str,
+    random_seed: str,
+    antithetic: bool,
+) -> Dict[str, float]:
+    """
+    Returns the KPIs of one replication, for antithetic replications the average
+    of the regular and the antithetic run.
+    """
+    kpis = simulate(
+        config,
+        runtime=runtime,
+        logging_id=logging_id,
+        random_seed=random_seed,
+        write_event_log=False,
+    )
+    if not antithetic:
+        return kpis
+
+    kpis_antithetic = simulate(
+        config,
+        runtime=runtime,
+        logging_id=f"{logging_id}_antithetic",
+        random_seed=random_seed,
+        antithetic=True,
+        write_event_log=False,
+    )
+    return {k: (v + kpis_antithetic[k]) / 2 for k, v in kpis.items()}
+
+
+def compare(
+    config_files: List[str],
+    replications: int,
+    runtime: int,
+    random_seed: str = "0",
+    common_random_numbers: bool = True,
+    antithetic: bool = False,
+    confidence: float = 0.95,
+) -> dict:
+    """
+    Runs all configurations for the given number of replications and returns the
+    confidence intervals of the KPIs per configuration and of the paired differences
+    with the first (baseline) configuration.
+    With common random numbers the configurations use the same seed per replication.
+    """
+    results = {}
+    for i_config, config_file in enumerate(config_files):
+        with open(config_file) as f:
+            config = load(f)
+
+        results[config_file] = []
+        for i in range(replications):
+            seed = (
+                f"{random_seed}_{i}"
+                if common_random_numbers
+                else f"{random_seed}_{i_config}_{i}"
+            )
+            results[config_file].append(
+                run_replication(
+                    config,
+                    runtime=runtime,
+                    logging_id=f"{Path(config_file).stem}_{seed}",
+                    random_seed=seed,
+                    antithetic=antithetic,
+                )
+            )
+            logger.info(f"{config_file} - replication {i}: {results[config_file][-1]}")
+
+    baseline = config_files[0]
+    kpi_names = list(results[baseline][0].keys())
+    return {
+        "replications": replications,
+        "common_random_numbers": common_random_numbers,
+        "antithetic": antithetic,
+        "confidence": confidence,
+        "scenarios": {
+            config_file: {
+                k: confidence_interval([r[k] for r in runs], confidence)
+                for k in kpi_names
+            }
+            for config_file, runs in results.items()
+        },
+        "differences": {
+            config_file: {
+                k: confidence_interval(
+                    [r[k] - b[k] for r, b in zip(runs, results[baseline])],
+                    confidence,
+                )
+                for k in kpi_names
+            }
+            for config_file, runs in results.items()
+            if config_file != baseline
+        },
+    }
+
+
+def format_interval(interval: dict) -> str:
+    if interval["half_width"] is None:
+        return f"{interval['mean']:.4g}"
+    return f"{interval['mean']:.4g} ± {interval['half_width']:.3g}"
+
+
+def print_comparison(comparison: dict):
+    print(
+        f"Replications: {comparison['replications']}, "
+        f"common random numbers: {comparison['common_random_numbers']}, "
+        f"antithetic: {comparison['antithetic']}, "
+        f"confidence: {comparison['confidence']}"
+    )
+    for config_file, kpis in comparison["scenarios"].items():
+        print(f"\n{config_file}")
+        for k, interval in kpis.items():
+            print(f"  {k}: {format_interval(interval)}")
+    for config_file, kpis in comparison["differences"].items():
+        print(f"\n{config_file} - {next(iter(comparison['scenarios']))}")
+        for k, interval in kpis.items():
+            print(f"  {k}: {format_interval(interval)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="assembly_simulation_compare",
+        description="Compare simulation configurations with paired replications.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "config_files",
+        nargs="+",
+        help="Paths to simulation configuration files, the first one is the baseline.",
+    )
+    parser.add_argument(
+        "-n", "--replications", help="Number of replications.", type=int, default=10
+    )
+    parser.add_argument(
+        "-s",
+        "--random_seed",
+        help="Seed from which the replication seeds are derived.",
+        default="0",
+    )
+    parser.add_argument("-r", "--runtime", help="Maximum simulation time.", default=100)
+    parser.add_argument(
+        "-a",
+        "--antithetic",
+        help="Use antithetic replication pairs.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--independent",
+        help="Use independent instead of common random numbers for the configurations.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c", "--confidence", help="Confidence level.", type=float, default=0.95
+    )
+    parser.add_argument(
+        "-o", "--output_file", help="Name/path of the output JSON file.", default=None
+    )
+
+    args = parser.parse_args()
+
+    comparison = compare(
+        config_files=args.config_files,
+        replications=args.replications,
+        runtime=args.runtime,
+        random_seed=args.random_seed,
+        common_random_numbers=not args.independent,
+        antithetic=args.antithetic,
+        confidence=args.confidence,
+    )
+    print_comparison(comparison)
+
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            dump(comparison, f, indent=2)
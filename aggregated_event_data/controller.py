@@ -1,7 +1,6 @@
 import logging
 
-from random import shuffle
-from simpy import Environment, FilterStore, PriorityItem, Store
+from simpy import Container, Environment, FilterStore, PriorityItem, Store
 from typing import Dict
 
 logger = logging.getLogger()
@@ -11,10 +10,12 @@ from aggregated_event_data.production_entities import (
     ProductionLot,
     SplitConfiguration,
 )
+from aggregated_event_data.random_streams import RandomStream
+from aggregated_event_data.symbols import SPLIT
 
 
-def partition_list(list_in: list, n: int):
-    shuffle(list_in)
+def partition_list(list_in: list, n: int, random_stream: RandomStream):
+    random_stream.shuffle(list_in)
     return [list_in[i::n] for i in range(n)]
 
 
@@ -25,6 +26,7 @@ class Controller:
         resources: Dict[str, list],
         lot_store: Store,
         packing_store: Store,
+        wip: Container = None,
     ):
         self.env = env
         self.resources = resources
@@ -32,6 +34,8 @@ class Controller:
         self.merge_store = FilterStore(env)  # merge to specific target lot
         self.merge_store_model = FilterStore(env)  # merge based on model
         self.packing_store = packing_store
+        self.wip = wip  # devices in the factory (CONWIP)
+        self.split_stream = env.random_streams.get_stream("Controller/split")
 
         self.controller_running = env.process(self.running())
 
@@ -44,8 +48,12 @@ class Controller:
                 else ""
             )
 
-            merge_config = lot_to_schedule.get_merge_after_step(last_executed_step)
-            split_config = lot_to_schedule.get_split_after_step(last_executed_step)
+            # Lots returning from a merge/split continue with their next step
+            if last_executed_step in ("merge", "split"):
+                merge_config = split_config = None
+            else:
+                merge_config = lot_to_schedule.get_merge_config()
+                split_config = lot_to_schedule.get_split_config()
 
             # Assume merge and split cannot happen after the same step
             if merge_config:
@@ -64,7 +72,6 @@ class Controller:
                 elif merge_lot_identifier:
                     # If lot has to be merged to specific lot, add to store
                     yield self.merge_store.put(lot_to_schedule)
-                    lot_to_schedule.closed = True
                 else:
                     # Check if there is a lot with the same model in the store
                     lots_same_model = [
@@ -90,17 +97,19 @@ class Controller:
 
             elif split_config:
                 self.env.process(self.split_lot(lot_to_schedule, split_config))
-                lot_to_schedule.closed = True
+                lot_to_schedule.close()
 
-            elif lot_to_schedule.required_steps:
+            elif lot_to_schedule.has_remaining_steps():
                 self.env.process(self.schedule_lot(lot_to_schedule))
 
             else:
                 self.packing_store.put(lot_to_schedule)
-                lot_to_schedule.closed = True
+                lot_to_schedule.close()
+                if self.wip and lot_to_schedule.devices:
+                    self.wip.get(len(lot_to_schedule.devices))
 
     def schedule_lot(self, lot_to_schedule: ProductionLot):
-        next_step = lot_to_schedule.required_steps.pop(0)
+        next_step = lot_to_schedule.next_step()
 
         # Simple heuristic to schedule the lot at the resource with the shortest queue
         min_len = 10000000
@@ -151,17 +160,19 @@ class Controller:
         target_lot.devices.extend(source_lot.devices)
         source_lot.devices = []
         logger.info(
-            f"{target_lot.identifier} [{self.env.now}] - Merged {source_lot.identifier}"
+            f"{target_lot.get_name()} [{self.env.now}] - Merged {source_lot.get_name()}"
         )
         source_lot.executed_steps.append("merge")
         target_lot.executed_steps.append("merge")
+        # Merged-away lots leave the system
+        source_lot.close()
 
         yield self.lot_store.put(target_lot)
         return
 
     def split_lot(self, target_lot: ProductionLot, config: SplitConfiguration):
         n = config.number_of_split_lots
-        devices_list = partition_list(target_lot.devices, n)
+        devices_list = partition_list(target_lot.devices, n, self.split_stream)
         splitted_lots = []
         for i in range(n):
             # Do not create lots without devices
@@ -170,13 +181,13 @@ class Controller:
 
             lot = ProductionLot(
                 env=self.env,
-                identifier=f"{target_lot.identifier}_{i}",
-                required_steps=target_lot.required_steps.copy(),
-                required_material=target_lot.required_material.copy(),
+                identifier=self.env.logging.symbols.derive(
+                    target_lot.identifier, SPLIT, i
+                ),
+                plan=target_lot.plan,
+                cursor=target_lot.cursor,
                 devices=devices_list[i],
                 executed_steps=target_lot.executed_steps.copy(),
-                merge_configs=target_lot.merge_configs,
-                split_configs=target_lot.split_configs,
             )
 
             splitted_lots.append(lot)
@@ -203,7 +214,7 @@ class Controller:
         )
 
         logger.info(
-            f"{target_lot.identifier} [{self.env.now}] - Splitted {[lot.identifier for lot in splitted_lots]}"
+            f"{target_lot.get_name()} [{self.env.now}] - Splitted {[lot.get_name() for lot in splitted_lots]}"
         )
 
         for lot in splitted_lots:
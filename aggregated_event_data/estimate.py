@@ -0,0 +1,417 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+from collections import defaultdict
+from json import dump, load
+from math import factorial
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+logger = logging.getLogger()
+
+from aggregated_event_data.analyze import analyze
+from aggregated_event_data.simulate import simulate
+
+# Fixed durations in the simulation model
+DEPARTURE_TIME = 1 / 1000
+MERGE_SPLIT_TIME = 0.1
+PACKING_TIME = 0.1
+
+
+def get_service_time(resource_config: dict) -> Tuple[float, float, float]:
+    """
+    Returns the mean time a resource is occupied by a job, its squared coefficient of variation and
+    the mean processing time (including repairs). A job occupies the resource from the move of the
+    lot (drawn with rate mean_move) until its departure. Breakdowns occur in processing time, so the
+    number of breakdowns during processing time P is Poisson distributed with mean P / mean_breakdown.
+    """
+    move = 1 / resource_config["mean_move"]
+    process = resource_config["mean_duration"]
+    mean_breakdown = resource_config["mean_breakdown"]
+    mean_repair = resource_config["mean_repair"]
+
+    inflation = 1 + mean_repair / mean_breakdown
+    processing = process * inflation
+    mean = move + processing + DEPARTURE_TIME
+    variance = move**2 + processing**2 + process / mean_breakdown * 2 * mean_repair**2
+    return mean, variance / mean**2, processing
+
+
+def get_route_jobs(
+    lot_config: dict, lot_devices: Dict[str, int]
+) -> List[Tuple[str, float, float]]:
+    """
+    Returns the expected number of jobs (lots) and devices per job for each step of the route of a lot.
+    Splits multiply the number of jobs, merged-away lots do not continue, lots merged based on
+    their model are assumed to be merged in pairs. Merging split lots of the lot itself
+    ('<id>_<index>') reduces the number of jobs again.
+    """
+    lot_id = lot_config["id"]
+    merge_after = {m["after_step"]: m for m in lot_config.get("merge", [])}
+    split_after = {s["after_step"]: s for s in lot_config.get("split", [])}
+
+    jobs, devices = 1.0, float(lot_config["n_devices"])
+    route = []
+    for step in lot_config["steps"]:
+        if jobs == 0:
+            break
+        route.append((step, jobs, devices))
+
+        if step in merge_after:
+            lot_identifiers = merge_after[step].get("lot_identifiers")
+            if not lot_identifiers:
+                jobs, devices = jobs / 2, devices * 2
+            elif is_own_lot(lot_identifiers[0], lot_id):
+                own = [i for i in lot_identifiers if is_own_lot(i, lot_id)]
+                merged_jobs = max(jobs - len(own) + 1, 1)
+                devices = jobs * devices / merged_jobs + sum(
+                    lot_devices.get(i, 0) for i in lot_identifiers if i not in own
+                )
+                jobs = merged_jobs
+            else:
+                jobs = 0
+        elif step in split_after:
+            n = min(split_after[step]["number_of_split_lots"], devices)
+            jobs, devices = jobs * n, devices / n
+    return route
+
+
+def is_own_lot(identifier: str, lot_id: str) -> bool:
+    """
+    Returns whether the identifier is the lot itself or one of its split lots ('<id>_<index>').
+    """
+    if identifier == lot_id:
+        return True
+    parent, _, index = identifier.rpartition("_")
+    return parent == lot_id and index.isdigit()
+
+
+class Station:
+    """
+    Capability with its parallel resources, approximated by identical servers.
+    """
+
+    def __init__(self, capability: str, resource_configs: List[dict]):
+        self.capability = capability
+        self.servers = len(resource_configs)
+
+        service_times = {r["id"]: get_service_time(r) for r in resource_configs}
+        # Resources share the jobs in proportion to their service rate
+        rate = sum(1 / mean for mean, _, _ in service_times.values())
+        self.service_time = self.servers / rate
+        self.scv = sum(scv / mean for mean, scv, _ in service_times.values()) / rate
+        self.processing_times = {
+            resource: (1 / mean / rate, processing)
+            for resource, (mean, _, processing) in service_times.items()
+        }
+
+        self.visits = 0.0  # jobs per released lot
+
+    def get_waiting_time(self, arrival_rate: float) -> float:
+        """
+        Mean waiting time in an open network (Erlang C with Allen-Cunneen correction).
+        """
+        m = self.servers
+        a = arrival_rate * self.service_time
+        rho = a / m
+        if rho >= 1:
+            return float("inf")
+        # Sum of a^k / k! for k < m, the normalization of the probability of waiting
+        idle_terms = sum(a**k / factorial(k) for k in range(m))
+        p_wait = a**m / factorial(m) / ((1 - rho) * idle_terms + a**m / factorial(m))
+        return p_wait * self.service_time / (m * (1 - rho)) * (1 + self.scv) / 2
+
+    def get_step_time(self, jobs: float) -> float:
+        """
+        Time to process the (parallel) jobs of one lot without waiting for other lots.
+        """
+        return jobs / min(jobs, self.servers) * self.service_time
+
+
+def build_network(config: dict) -> Tuple[Dict[str, Station], List[list]]:
+    """
+    Returns the stations (with visits per released lot) and the routes of the lots of the configuration.
+    """
+    resources = defaultdict(list)
+    for r in config["production_resources"]:
+        resources[r["step"]].append(r)
+    stations = {step: Station(step, rs) for step, rs in resources.items()}
+
+    lot_devices = {r["id"]: r["n_devices"] for r in config["production_lots"]}
+    routes = [get_route_jobs(r, lot_devices) for r in config["production_lots"]]
+    for route in routes:
+        for step, jobs, _ in route:
+            if step not in stations:
+                raise ValueError(f"No production resource for step '{step}'")
+            stations[step].visits += jobs / len(routes)
+    return stations, routes
+
+
+def mean_value_analysis(
+    stations: Dict[str, Station], delay: float, n_lots: int
+) -> float:
+    """
+    Returns the throughput (lots per time unit) of the closed network with n_lots lots,
+    multi-server stations are approximated by a single server and a delay (Seidmann).
+    """
+    demands = {
+        s.capability: s.visits * s.service_time / s.servers for s in stations.values()
+    }
+    delay += sum(
+        s.visits * s.service_time * (s.servers - 1) / s.servers
+        for s in stations.values()
+    )
+
+    queue = {k: 0.0 for k in demands}
+    throughput = 0
+    for n in range(1, n_lots + 1):
+        residence = {k: d * (1 + queue[k]) for k, d in demands.items()}
+        throughput = n / (sum(residence.values()) + delay)
+        queue = {k: throughput * r for k, r in residence.items()}
+    return throughput
+
+
+def get_batch_makespan(
+    stations: Dict[str, Station], routes: List[list], packing_time: float
+) -> Tuple[float, float]:
+    """
+    Returns the makespan and the shortest lot path of lots that are released at once:
+    the longest lot path or the time to process all jobs at the bottleneck station, together
+    with the shortest time before the first job reaches it and after the last job leaves it.
+    """
+    paths = []
+    for route in routes:
+        times = [stations[step].get_step_time(jobs) for step, jobs, _ in route]
+        times.append(packing_time * route[-1][1] * route[-1][2] if route else 0)
+        paths.append((route, times))
+
+    makespan = max(sum(times) for _, times in paths)
+    shortest_path = min(sum(times) for _, times in paths)
+    for capability, station in stations.items():
+        head = tail = float("inf")
+        work = 0
+        for route, times in paths:
+            for i, (step, jobs, _) in enumerate(route):
+                if step == capability:
+                    head = min(head, sum(times[:i]))
+                    tail = min(tail, sum(times[i + 1 :]))
+                    work += jobs * station.service_time
+        if work:
+            makespan = max(makespan, head + work / station.servers + tail)
+
+    # Packing is a single server as well
+    packing_work = sum(
+        packing_time * route[-1][1] * route[-1][2] for route, _ in paths if route
+    )
+    return max(makespan, packing_work), shortest_path
+
+
+def estimate(config: dict) -> dict:
+    """
+    Estimates throughput, utilization and cycle time of the configuration with a queueing network:
+    an open network for release policy 'rate', a closed network (MVA) for a WIP limit and
+    otherwise a batch of lots that are released at once (release times are ignored).
+    The supply of material lots is assumed not to delay production.
+    """
+    stations, routes = build_network(config)
+    n_lots = len(routes)
+    devices_per_lot = sum(r["n_devices"] for r in config["production_lots"]) / n_lots
+    merge_split_delay = (
+        MERGE_SPLIT_TIME
+        * sum(
+            len(r.get("merge", [])) + len(r.get("split", []))
+            for r in config["production_lots"]
+        )
+        / n_lots
+    )
+    packing_time = PACKING_TIME / config["packing_unit_size"]
+
+    release_config = config.get("release", {})
+    arrival_rate = (
+        1 / release_config["mean_interarrival"]
+        if release_config.get("policy") == "rate"
+        else float("inf")
+    )
+    if release_config.get("wip_limit"):
+        mode = "closed"
+        n_wip = max(int(release_config["wip_limit"] // devices_per_lot), 1)
+        throughput = min(
+            mean_value_analysis(stations, merge_split_delay, n_wip), arrival_rate
+        )
+        cycle_time = n_wip / throughput
+        makespan = None
+    elif release_config.get("policy") == "rate":
+        mode = "open"
+        throughput = arrival_rate
+        waiting_times = {
+            k: s.get_waiting_time(throughput * s.visits) for k, s in stations.items()
+        }
+        cycle_time = (
+            merge_split_delay
+            + sum(
+                jobs * (waiting_times[step] + stations[step].service_time)
+                for route in routes
+                for step, jobs, _ in route
+            )
+            / n_lots
+        )
+        if cycle_time == float("inf"):
+            # Queues grow without bound, see 'feasible'
+            cycle_time = None
+        makespan = None
+    else:
+        mode = "batch"
+        makespan, shortest_path = get_batch_makespan(stations, routes, packing_time)
+        throughput = n_lots / makespan
+        # Lots are assumed to finish evenly spread over time
+        cycle_time = merge_split_delay + (shortest_path + makespan) / 2
+
+    # Processing (from arrival until transformation) per resource, as in the event log reports
+    occupation = {}
+    utilization = {}
+    for s in stations.values():
+        occupation[s.capability] = throughput * s.visits * s.service_time / s.servers
+        for resource, (share, processing) in s.processing_times.items():
+            utilization[resource] = throughput * s.visits * share * processing
+
+    return {
+        "mode": mode,
+        "feasible": all(rho < 1 for rho in occupation.values()),
+        "throughput_lots": throughput,
+        "throughput_devices": throughput * devices_per_lot,
+        "cycle_time": cycle_time,
+        "makespan": makespan,
+        "station_occupation": occupation,
+        "resource_utilization": utilization,
+    }
+
+
+def get_station_utilization(config: dict, resource_utilization: dict) -> dict:
+    """
+    Returns the mean utilization of the resources per capability.
+    """
+    utilization = defaultdict(list)
+    for r in config["production_resources"]:
+        utilization[r["step"]].append(resource_utilization.get(r["id"], 0))
+    return {k: sum(v) / len(v) for k, v in utilization.items()}
+
+
+def compare_with_simulation(
+    config: dict, estimation: dict, runtime: int, replications: int
+) -> dict:
+    """
+    Simulates the configuration and returns the relative error of the estimate per KPI.
+    Utilization is compared per capability, the dispatching of lots to the resources of a
+    capability is not part of the estimate. Replications in which nothing is packed within
+    the runtime are skipped.
+    """
+    simulated = defaultdict(list)
+    skipped = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(replications):
+            event_log_file = os.path.join(tmp, f"event_log_{i}.json")
+            kpis = simulate(
+                config,
+                runtime=runtime,
+                logging_id=f"estimate_{i}",
+                random_seed=str(i),
+                output_event_log_file=event_log_file,
+            )
+            # Lots are finite, so rates are taken until the last packing
+            duration = kpis["makespan"]
+            if not duration:
+                logger.warning(
+                    f"Replication {i} - nothing packed within runtime {runtime}, skipped"
+                )
+                skipped += 1
+                continue
+
+            report = analyze(event_log_file, processes=1)
+            simulated["throughput_devices"].append(kpis["packed_devices"] / duration)
+            if estimation["mode"] == "batch":
+                simulated["makespan"].append(kpis["makespan"])
+            span = report["last_timestamp"] - report["first_timestamp"]
+            utilization = get_station_utilization(
+                config,
+                {
+                    resource: u * span / duration
+                    for resource, u in report["resource_utilization"].items()
+                },
+            )
+            for capability, u in utilization.items():
+                simulated[f"utilization/{capability}"].append(u)
+
+    estimated = {
+        "throughput_devices": estimation["throughput_devices"],
+        "makespan": estimation["makespan"],
+    }
+    for capability, u in get_station_utilization(
+        config, estimation["resource_utilization"]
+    ).items():
+        estimated[f"utilization/{capability}"] = u
+
+    errors = {}
+    for kpi, values in simulated.items():
+        value = sum(values) / len(values)
+        errors[kpi] = {
+            "estimate": estimated[kpi],
+            "simulation": value,
+            "relative_error": (estimated[kpi] - value) / value if value else None,
+        }
+    return {
+        "replications": replications - skipped,
+        "skipped_replications": skipped,
+        "errors": errors,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="assembly_simulation_estimate",
+        description="Estimate throughput, utilization and cycle time with a queueing network.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "config_files", nargs="+", help="Paths to simulation configuration files."
+    )
+    parser.add_argument(
+        "-n",
+        "--replications",
+        help="Number of simulation replications to compare the estimate with (default: no comparison).",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "-r",
+        "--runtime",
+        help="Maximum simulation time for the comparison.",
+        type=float,
+        default=10000,
+    )
+    parser.add_argument(
+        "-o", "--output_file", help="Name/path of the output JSON file.", default=None
+    )
+
+    args = parser.parse_args()
+
+    estimations = {}
+    for config_file in args.config_files:
+        with open(config_file) as f:
+            config = load(f)
+        estimations[config_file] = estimate(config)
+        if args.replications:
+            estimations[config_file]["simulation_error"] = compare_with_simulation(
+                config, estimations[config_file], args.runtime, args.replications
+            )
+
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            dump(estimations, f, indent=2)
+    else:
+        dump(estimations, sys.stdout, indent=2)
@@ -3,22 +3,39 @@ import os
 
 logger = logging.getLogger()
 
-from json import dump
+from json import dump, dumps, loads
 from functools import partial, wraps
 from pathlib import Path
 from simpy import Environment
+from typing import List
 
 
-from aggregated_event_data.production_entities import Lot
+from aggregated_event_data.production_entities import Device, Lot, Product
+from aggregated_event_data.streaming import EventStreamServer
+from aggregated_event_data.symbols import SymbolTable
 
 DEFAULT_LOGS_FOLDER = Path(__file__).parent.parent.joinpath("logs")
 
 
 class SimulationEventLogging:
-    def __init__(self, env: Environment, identifier: str, event_log_file: str = None):
+    """
+    Captures the events of the simulation in the environment and writes them as event log.
+    Without an environment (e.g. to write the event log of a trace) no events are captured.
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        identifier: str,
+        event_log_file: str = None,
+        event_stream: EventStreamServer = None,
+        spill_closed_entities: bool = False,
+    ):
         self.env = env
         self.identifier = identifier
+        self.event_stream = event_stream  # optional live streaming of events
 
+        os.makedirs(DEFAULT_LOGS_FOLDER, exist_ok=True)
         self.events_file = os.path.join(
             DEFAULT_LOGS_FOLDER, f"{self.identifier}_events.txt"
         )
@@ -29,15 +46,31 @@ class SimulationEventLogging:
                 DEFAULT_LOGS_FOLDER, f"{self.identifier}_event_log.json"
             )
 
-        self.aggregated_entities = set()
-        self.products = set()
+        # Entities, devices, materials and locations have integer identifiers during the simulation,
+        # their strings are only built at export
+        self.symbols = SymbolTable()
+
+        # Lightweight records (identifier -> class name), no references to the entities themselves
+        self.aggregated_entities = {}
+        self.products = {}
+
+        # Records of closed entities are (optionally) moved to disk
+        self.entities_spill = None
+        if spill_closed_entities:
+            self.entities_file = os.path.join(
+                DEFAULT_LOGS_FOLDER, f"{self.identifier}_entities.jsonl"
+            )
+            self.entities_spill = open(self.entities_file, "w+")
+
+        # Capture event data
+        self.event_list = []
+        if env is None:
+            return
 
         # Clear event log
         with open(self.events_file, "w") as f:
             f.write("")
 
-        # Capture event data
-        self.event_list = []
         # Bind *data* as first argument to monitor()
         # see https://docs.python.org/3/library/functools.html#functools.partial
         monitor = partial(self.monitor, self.event_list)
@@ -69,10 +102,14 @@ class SimulationEventLogging:
     def monitor(self, event_list, t, prio, eid, event):
         with open(self.events_file, "a") as f:
             f.write(f"{t}: {str(event)}\n")
+        if self.event_stream:
+            self.event_stream.wait_for(t)
         if isinstance(event._value, dict):
             event_dict = {"eventIdentifier": str(eid), "timestamp": t}
             event_dict.update(event._value)
             event_list.append(event_dict)
+            if self.event_stream:
+                self.event_stream.publish(self.export_event(event_dict, cache={}))
 
     def monitor_lot_store(env, store):
         while True:
@@ -80,73 +117,224 @@ class SimulationEventLogging:
             logger.info(env.now, " - lots in store: ", store.items)
 
     def register_aggregated_entity(self, entity: Lot):
-        self.aggregated_entities.add(entity)
+        self.aggregated_entities[entity.identifier] = entity.__class__.__name__
 
-    def register_product(self, product: str):
-        self.products.add(product)
+    def close_aggregated_entity(self, entity: Lot):
+        """
+        Called when an entity leaves the system, spills its record to disk (if enabled).
+        """
+        if self.entities_spill and entity.identifier in self.aggregated_entities:
+            class_name = self.aggregated_entities.pop(entity.identifier)
+            self.entities_spill.write(dumps([entity.identifier, class_name]) + "\n")
 
-    def write_json_event_data(self):
-        aggregated_entities = [
-            {
-                "@type": ["AggregatedEntity", e.__class__.__name__],
-                "identifier": e.identifier,
-                "rdfs:label": e.identifier,
-            }
-            for e in self.aggregated_entities
-        ]
+    def register_product(self, product: Product):
+        self.products[product.identifier] = product.kind
+
+    def get_entities(self) -> list:
+        """
+        Returns the (identifier, class name) records of all entities, including the spilled ones.
+        """
+        entities = []
+        if self.entities_spill:
+            self.entities_spill.seek(0)
+            entities.extend(loads(line) for line in self.entities_spill)
+        entities.extend(self.aggregated_entities.items())
+        return entities
+
+    def get_entity_records(self) -> List[dict]:
+        records = []
+        for identifier, class_name in self.get_entities():
+            identifier = self.symbols.resolve(identifier)
+            records.append(
+                {
+                    "@type": ["AggregatedEntity", class_name],
+                    "identifier": identifier,
+                    "rdfs:label": identifier,
+                }
+            )
+        return records
 
-        products = [
+    def get_product_records(self) -> List[dict]:
+        return [
             {
                 "@type": "Product",
-                "identifier": p.identifier,
-                "rdfs:label": p.identifier,
+                "identifier": identifier,
+                "rdfs:label": identifier,
             }
-            for p in self.products
+            for identifier in self.products
         ]
 
-        # Convert devices to dictionary
-        for e in self.event_list:
-            e["_devices"] = [d.__dict__ for d in e["_devices"]]
-
-        event_log = {
-            "@context": {
-                "@version": 1.1,
-                "@base": "http://example.org/id/ekg/aggregated_traces/",
-                "@vocab": "http://example.org/def/ekg/aggregated_traces/",
-                "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
-                "prov": "http://www.w3.org/ns/prov#",
-                "events": {
-                    "@container": "@set",
-                    "@context": {
-                        "eventIdentifier": "@id",
-                        "eventType": "@type",
-                        "entity": {"@type": "@id"},
-                        "parentEntity": {"@type": "@id"},
-                        "childEntity": {"@type": "@id"},
-                        "location": {"@type": "@id"},
-                        "_devices": {
-                            "@id": "device",
-                            "@container": "@set",
-                            "@context": {
-                                "identifier": "@id",
-                                "materials": {
-                                    "@id": "material",
-                                    "@container": "@set",
-                                    "@type": "@id",
-                                },
+    def export_device(self, device: Device, cache: dict) -> dict:
+        return {
+            "identifier": self.symbols.resolve(device.identifier, cache),
+            "materials": [self.symbols.resolve(m, cache) for m in device.materials],
+            "quality": device.quality,
+        }
+
+    def export_quantity(self, quantity: dict, cache: dict) -> dict:
+        identifier, product = quantity["class"]
+        return {
+            "amount": quantity["amount"],
+            "class": [self.symbols.resolve(identifier, cache), product],
+        }
+
+    def export_event(self, event: dict, cache: dict) -> dict:
+        """
+        Returns a copy of the captured event with string identifiers and the devices as dictionaries.
+        """
+        exported = {}
+        for key, value in event.items():
+            if key in ("entity", "parentEntity", "location"):
+                value = self.symbols.resolve(value, cache)
+            elif key == "childEntity":
+                value = (
+                    [self.symbols.resolve(i, cache) for i in value]
+                    if isinstance(value, list)
+                    else self.symbols.resolve(value, cache)
+                )
+            elif key in ("quantity", "outputQuantity"):
+                value = self.export_quantity(value, cache)
+            elif key in ("inputQuantity", "childQuantity"):
+                value = [self.export_quantity(q, cache) for q in value]
+            elif key == "_materials":
+                value = [self.symbols.resolve(m, cache) for m in value]
+            elif key == "_devices":
+                value = [self.export_device(d, cache) for d in value]
+            exported[key] = value
+        return exported
+
+    def export_events(self):
+        """
+        Converts the captured events to their exported form (string identifiers, devices as dictionaries).
+        """
+        cache = {}
+        self.event_list[:] = [self.export_event(e, cache) for e in self.event_list]
+
+    def write_trace(self, trace_file: str):
+        """
+        Writes the captured events in their compact form (integer identifiers, device states) with
+        the symbol table and the records of the entities and products, from which the event log can be
+        written again without simulating. Has to be called before the events are exported.
+        """
+        # Materials of a device are only appended, every state of a device is a prefix of its
+        # last materials
+        devices = {}
+        events = []
+        for event in self.event_list:
+            event = dict(event)
+            if "_materials" in event:
+                event["_materials"] = list(event["_materials"])
+            if "_devices" in event:
+                for d in event["_devices"]:
+                    if len(d.materials) > len(devices.get(d.identifier, ())):
+                        devices[d.identifier] = d.materials
+                event["_devices"] = [
+                    [d.identifier, len(d.materials), d.quality]
+                    for d in event["_devices"]
+                ]
+            events.append(event)
+
+        with open(trace_file, "w") as f:
+            dump(
+                {
+                    "symbols": self.symbols.to_dict(),
+                    "entities": self.get_entities(),
+                    "products": list(self.products.items()),
+                    "devices": list(devices.items()),
+                    "events": events,
+                },
+                f,
+            )
+
+    def load_trace(self, trace: dict):
+        """
+        Restores the captured events, symbol table and records of a trace written by write_trace().
+        """
+        self.symbols = SymbolTable.from_dict(trace["symbols"])
+        self.aggregated_entities = dict(trace["entities"])
+        self.products = dict(trace["products"])
+
+        devices = dict(trace["devices"])
+        self.event_list[:] = trace["events"]
+        for event in self.event_list:
+            if "_devices" in event:
+                event["_devices"] = [
+                    self.restore_device(identifier, devices.get(identifier, []), n, q)
+                    for identifier, n, q in event["_devices"]
+                ]
+
+    @staticmethod
+    def restore_device(
+        identifier: int, materials: list, n_materials: int, quality: float
+    ) -> Device:
+        device = Device(identifier)
+        device.materials = materials[:n_materials]
+        device.quality = quality
+        return device
+
+    def close(self):
+        """
+        Closes the file with the spilled entity records, they cannot be retrieved anymore.
+        """
+        if self.entities_spill and not self.entities_spill.closed:
+            self.entities_spill.close()
+
+    def write_json_event_data(self):
+        self.export_events()
+        write_json_event_log(
+            self.event_log_file,
+            events=self.event_list,
+            aggregated_entities=self.get_entity_records(),
+            products=self.get_product_records(),
+        )
+        self.close()
+
+
+def write_json_event_log(
+    event_log_file: str,
+    events: List[dict],
+    aggregated_entities: List[dict],
+    products: List[dict],
+):
+    event_log = {
+        "@context": {
+            "@version": 1.1,
+            "@base": "http://example.org/id/ekg/aggregated_traces/",
+            "@vocab": "http://example.org/def/ekg/aggregated_traces/",
+            "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+            "prov": "http://www.w3.org/ns/prov#",
+            "events": {
+                "@container": "@set",
+                "@context": {
+                    "eventIdentifier": "@id",
+                    "eventType": "@type",
+                    "entity": {"@type": "@id"},
+                    "parentEntity": {"@type": "@id"},
+                    "childEntity": {"@type": "@id"},
+                    "location": {"@type": "@id"},
+                    "_devices": {
+                        "@id": "device",
+                        "@container": "@set",
+                        "@context": {
+                            "identifier": "@id",
+                            "materials": {
+                                "@id": "material",
+                                "@container": "@set",
+                                "@type": "@id",
                             },
                         },
-                        "_materials": {"@id": "material", "@type": "@id"},
-                        "class": {"@type": "@id"},
                     },
+                    "_materials": {"@id": "material", "@type": "@id"},
+                    "class": {"@type": "@id"},
                 },
-                "entities": {"@container": "@set", "@context": {"identifier": "@id"}},
-                "products": {"@container": "@set", "@context": {"identifier": "@id"}},
             },
-            "events": self.event_list,
-            "entities": aggregated_entities,
-            "products": products,
-        }
+            "entities": {"@container": "@set", "@context": {"identifier": "@id"}},
+            "products": {"@container": "@set", "@context": {"identifier": "@id"}},
+        },
+        "events": events,
+        "entities": aggregated_entities,
+        "products": products,
+    }
 
-        with open(self.event_log_file, "w") as f:
-            dump(event_log, f, indent=2)
+    with open(event_log_file, "w") as f:
+        dump(event_log, f, indent=2)
@@ -1,13 +1,18 @@
 from copy import deepcopy
 from simpy import Environment
-from typing import List
+from typing import TYPE_CHECKING, List, Sequence
+
+from aggregated_event_data.symbols import MATERIAL
+
+if TYPE_CHECKING:
+    from aggregated_event_data.routing import RoutingPlan
 
 
 class Lot:
     def __init__(
         self,
         env: Environment,
-        identifier: str,
+        identifier: int,
     ) -> None:
         self.env = env
         self.identifier = identifier
@@ -15,7 +20,22 @@ class Lot:
 
         self.env.logging.register_aggregated_entity(self)
 
-    def create(self, amount: int, devices: List[dict] = [], materials: List[str] = []):
+    def get_name(self) -> str:
+        """
+        Returns the string identifier of the lot (e.g. for log messages).
+        """
+        return self.env.logging.symbols.resolve(self.identifier)
+
+    def close(self):
+        """
+        Marks the lot as closed, it has left the system.
+        """
+        self.closed = True
+        self.env.logging.close_aggregated_entity(self)
+
+    def create(
+        self, amount: int, devices: List["Device"] = [], materials: Sequence[int] = ()
+    ):
         yield self.env.timeout(
             0,
             value={
@@ -30,7 +50,7 @@ class Lot:
                     ],
                 },
                 "_devices": deepcopy(devices),
-                "_materials": materials.copy(),
+                "_materials": materials,
             },
         )
 
@@ -47,7 +67,7 @@ class Lot:
             operations = list(dict.fromkeys(operations))
             lot_model = Product(label="-".join(operations), kind="lotModel")
         else:
-            raise AttributeError(f"Type of lot {self.identifier} is not defined!")
+            raise AttributeError(f"Type of lot {self.get_name()} is not defined!")
 
         self.env.logging.register_product(lot_model)
         return lot_model
@@ -57,7 +77,7 @@ class MergeConfiguration:
     def __init__(
         self,
         after_step: str,
-        lot_identifiers: List[str] = None,
+        lot_identifiers: List[int] = None,
     ):
         self.after_step = after_step
         self.lot_identifiers = lot_identifiers
@@ -77,43 +97,53 @@ class ProductionLot(Lot):
     def __init__(
         self,
         *args,
-        required_steps: list,
-        required_material: dict,
-        devices: List[dict],
-        merge_configs: List[MergeConfiguration] = None,
-        split_configs: List[SplitConfiguration] = None,
+        plan: "RoutingPlan",
+        devices: List["Device"],
+        cursor: int = 0,
         executed_steps: list = None,
         **kwargs,
     ) -> None:
         super().__init__(*args, **kwargs)
 
-        self.required_steps = required_steps
-        self.required_material = required_material
-        self.merge_configs = [] if not merge_configs else merge_configs
-        self.split_configs = [] if not split_configs else split_configs
+        # Shared routing plan, the cursor is the number of steps dispatched
+        self.plan = plan
+        self.cursor = cursor
         self.devices = devices
 
         self.executed_steps = executed_steps if executed_steps else []
 
         self.env.process(self.create(len(self.devices), devices=self.devices))
 
-    def get_merge_after_step(self, step: str) -> MergeConfiguration | None:
+    def has_remaining_steps(self) -> bool:
+        return self.cursor < len(self.plan)
+
+    def next_step(self) -> str:
         """
-        Returns the merge configuration for the given step,.
-        If there is no merge after the provided step nothing is returned
+        Returns the next step in the routing plan and advances the cursor.
         """
-        for config in self.merge_configs:
-            if config.after_step == step:
-                return config
+        step = self.plan.steps[self.cursor]
+        self.cursor += 1
+        return step
 
-    def get_split_after_step(self, step: str) -> SplitConfiguration | None:
+    def get_required_material(self) -> str | None:
         """
-        Returns the split configuration for the given step,.
-        If there is no split after the provided step nothing is returned
+        Returns the material type required for the step that was dispatched last.
         """
-        for config in self.split_configs:
-            if config.after_step == step:
-                return config
+        return self.plan.materials[self.cursor - 1] if self.cursor else None
+
+    def get_merge_config(self) -> MergeConfiguration | None:
+        """
+        Returns the merge configuration after the last executed step.
+        If there is no merge at the current position nothing is returned
+        """
+        return self.plan.merge_after[self.cursor]
+
+    def get_split_config(self) -> SplitConfiguration | None:
+        """
+        Returns the split configuration after the last executed step.
+        If there is no split at the current position nothing is returned
+        """
+        return self.plan.split_after[self.cursor]
 
 
 class MaterialLot(Lot):
@@ -129,7 +159,10 @@ class MaterialLot(Lot):
         self.material_type = material_type
         self.quantity = quantity
 
-        self.materials = [f"{self.identifier}_Material{d}" for d in range(quantity)]
+        # Consecutive identifiers, consumed from the end
+        self.materials = self.env.logging.symbols.derive_range(
+            self.identifier, MATERIAL, quantity
+        )
 
         self.env.process(self.create(self.quantity, materials=self.materials))
 
@@ -155,9 +188,12 @@ class Product:
 
 
 class Device:
+    # Devices are copied into every event, without instance dictionaries
+    __slots__ = ("identifier", "materials", "quality")
+
     def __init__(
         self,
-        identifier: str,
+        identifier: int,
     ) -> None:
         self.identifier = identifier
 
@@ -1,17 +1,183 @@
 import logging
 
-from collections import defaultdict
+from collections import defaultdict, deque
 from copy import deepcopy
-from random import expovariate, random, shuffle
-from simpy import Environment, FilterStore, Interrupt, PriorityStore, Store
+from simpy import Environment, FilterStore, PriorityStore, Store
+from typing import List, Set, Tuple
 
 logger = logging.getLogger()
 
 from aggregated_event_data.production_entities import PackingUnit
+from aggregated_event_data.random_streams import RandomStream
+from aggregated_event_data.symbols import PACKING_UNIT
 
 # Factor with which to change the device quality (when random number is below process yield)
 DEVICE_QUALITY_FACTOR = 0.5
 
+# Number of up/down periods generated at once for the availability timeline
+AVAILABILITY_BATCH_SIZE = 64
+
+
+class AvailabilityTimeline:
+    """
+    Up/down renewal timeline of a resource, generated lazily in batches.
+    Up times (exponential with mean_breakdown) are measured in processing time,
+    down times are exponential with mean_repair.
+    """
+
+    def __init__(
+        self,
+        mean_breakdown: float,
+        mean_repair: float,
+        breakdown_stream: RandomStream,
+        repair_stream: RandomStream,
+        batch_size: int = AVAILABILITY_BATCH_SIZE,
+    ):
+        self.mean_breakdown = mean_breakdown
+        self.mean_repair = mean_repair
+        self.breakdown_stream = breakdown_stream
+        self.repair_stream = repair_stream
+        self.batch_size = batch_size
+
+        self.uptimes = deque()
+        self.repairs = deque()
+
+    def extend(self):
+        self.uptimes.extend(
+            self.breakdown_stream.expovariate(1 / self.mean_breakdown)
+            for _ in range(self.batch_size)
+        )
+        self.repairs.extend(
+            self.repair_stream.expovariate(1 / self.mean_repair)
+            for _ in range(self.batch_size)
+        )
+
+    def get_breakdowns(self, duration: float) -> List[Tuple[float, float]]:
+        """
+        Returns the breakdowns during processing for the given duration, as a list of
+        (processing time until breakdown, repair time) tuples, and advances the timeline.
+        """
+        breakdowns = []
+        while True:
+            if not self.uptimes:
+                self.extend()
+            if duration < self.uptimes[0]:
+                self.uptimes[0] -= duration
+                return breakdowns
+
+            uptime = self.uptimes.popleft()
+            breakdowns.append((uptime, self.repairs.popleft()))
+            duration -= uptime
+
+
+class MaterialStaging:
+    """
+    Buffer of material lots at a capability, shared by the resources with that capability.
+    For material types that are only consumed at this capability, (partially consumed) material
+    lots stay staged instead of being returned to the shared store, and the buffer is topped up
+    from the store (up to max_lots) when fewer than reorder_point lots are staged.
+    Other material types are taken from and returned to the shared store per processing job.
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        material_lot_store: FilterStore,
+        exclusive_material_types: Set[str] = None,
+        reorder_point: int = 0,
+        max_lots: int = 0,
+    ):
+        self.env = env
+        self.material_lot_store = material_lot_store
+        self.exclusive_material_types = exclusive_material_types or set()
+        self.reorder_point = reorder_point
+        self.max_lots = max_lots
+
+        self.staged = defaultdict(deque)  # material type -> material lots
+        # Pending requests for a staged material type, material type -> get request
+        self.requests = {}
+
+    def kit(self, material_type: str, devices: list):
+        """
+        Allocates one unit of material to each device, returns the consumed (material lot, quantity) pairs.
+        Consecutive ranges of material of a lot are allocated at once.
+        """
+        exclusive = material_type in self.exclusive_material_types
+        staged = self.staged[material_type] if exclusive else deque()
+
+        material_lots = []
+        remaining = len(devices)
+        while remaining:
+            if not staged:
+                if exclusive and material_type in self.requests:
+                    # Another resource waits for a lot of this type already, which is
+                    # staged for all resources (and may be consumed by that resource)
+                    yield self.requests[material_type]
+                    continue
+
+                request = self.material_lot_store.get(
+                    lambda mat_lot: mat_lot.material_type == material_type
+                )
+                if exclusive:
+                    self.requests[material_type] = request
+                mat_lot = yield request
+                if exclusive:
+                    del self.requests[material_type]
+                staged.append(mat_lot)
+
+            # Take at maximum the quantity of material present in the lot
+            mat_lot = staged[0]
+            q_consume = min(remaining, mat_lot.quantity)
+            mat_lot.quantity -= q_consume
+
+            materials = mat_lot.materials[-q_consume:]
+            mat_lot.materials = mat_lot.materials[:-q_consume]
+            for device, material in zip(
+                devices[remaining - q_consume : remaining], materials
+            ):
+                device.materials.append(material)
+            remaining -= q_consume
+
+            # Close lot if it is empty
+            if mat_lot.quantity == 0:
+                staged.popleft()
+                mat_lot.close()
+
+            material_lots.append((mat_lot, q_consume))
+
+        if exclusive and len(staged) < self.reorder_point:
+            self.replenish(material_type)
+
+        return material_lots
+
+    def replenish(self, material_type: str):
+        """
+        Moves the available lots of the material type from the shared store to the buffer,
+        up to max_lots. Lots that are requested by others have been handed out already,
+        so the get requests of the available lots succeed immediately.
+        """
+        staged = self.staged[material_type]
+        n_available = sum(
+            mat_lot.material_type == material_type
+            for mat_lot in self.material_lot_store.items
+        )
+        for _ in range(min(n_available, self.max_lots - len(staged))):
+            request = self.material_lot_store.get(
+                lambda mat_lot: mat_lot.material_type == material_type
+            )
+            staged.append(request.value)
+
+    def release(self, material_lots: list):
+        """
+        Returns the partially consumed lots of non-exclusive material types to the shared store.
+        """
+        for mat_lot, q in material_lots:
+            if (
+                not mat_lot.closed
+                and mat_lot.material_type not in self.exclusive_material_types
+            ):
+                self.material_lot_store.put(mat_lot)
+
 
 class ProductionResource:
     def __init__(
@@ -24,93 +190,81 @@ class ProductionResource:
         mean_breakdown: float,
         mean_repair: float,
         lot_store: Store,
-        material_lot_store: FilterStore = None,
+        material_staging: MaterialStaging = None,
         process_yield: float = 1.0,
     ) -> None:
         self.env = env
 
         self.identifier = identifier
+        self.location = env.logging.symbols.intern(identifier)
         self.capability = capability
         self.mean_move = mean_move
         self.mean_duration = mean_duration
         self.mean_breakdown = mean_breakdown
         self.mean_repair = mean_repair
         self.lot_store = lot_store
-        self.material_lot_store = material_lot_store
+        self.material_staging = material_staging
         self.process_yield = process_yield
 
+        # Separate random streams per purpose
+        random_streams = env.random_streams
+        self.move_stream = random_streams.get_stream(f"{identifier}/move")
+        self.duration_stream = random_streams.get_stream(f"{identifier}/duration")
+        self.yield_stream = random_streams.get_stream(f"{identifier}/yield")
+
+        self.availability = AvailabilityTimeline(
+            mean_breakdown,
+            mean_repair,
+            breakdown_stream=random_streams.get_stream(f"{identifier}/breakdown"),
+            repair_stream=random_streams.get_stream(f"{identifier}/repair"),
+        )
+
         self.state = "Idle"
         self.queue = PriorityStore(env)
         self.running_process = env.process(self.running())
 
     def running(self):
-        remaining_time = None
         while True:
-            if self.state == "Idle":
-                # Get next production lot in queue to start working on
-                priority_item = yield self.queue.get()
-                lot = priority_item.item
-                done_in = expovariate(1 / self.mean_duration)
-
-                # Wait for the lot to arrive at the resource
-                yield self.env.timeout(
-                    expovariate(self.mean_move),
-                    value={
-                        "eventType": "Object",
-                        "bizStep": "arriving",
-                        "entity": lot.identifier,
-                        "location": self.identifier,
-                        "quantity": {
-                            "amount": len(lot.devices),
-                            "class": [
-                                lot.identifier,
-                                lot.get_lot_model().identifier,
-                            ],
-                        },
-                        "_devices": deepcopy(lot.devices),
+            # Get next production lot in queue to start working on
+            priority_item = yield self.queue.get()
+            lot = priority_item.item
+            done_in = self.duration_stream.expovariate(1 / self.mean_duration)
+
+            # Wait for the lot to arrive at the resource
+            yield self.env.timeout(
+                self.move_stream.expovariate(self.mean_move),
+                value={
+                    "eventType": "Object",
+                    "bizStep": "arriving",
+                    "entity": lot.identifier,
+                    "location": self.location,
+                    "quantity": {
+                        "amount": len(lot.devices),
+                        "class": [
+                            lot.identifier,
+                            lot.get_lot_model().identifier,
+                        ],
                     },
-                )
-
-                # Consume materials (if required)
-                req_mat = lot.required_material.get(self.capability)
-                material_lots = []
-                if req_mat:
-                    requires_material = lot.devices.copy()
-                    while requires_material:
-                        mat_lot = yield self.material_lot_store.get(
-                            lambda mat_lot: mat_lot.material_type == req_mat
-                        )
-                        # Take at maximum the quantity of material present in the lot
-                        q_consume = min(len(requires_material), mat_lot.quantity)
-                        mat_lot.quantity -= q_consume
-
-                        for i in range(q_consume):
-                            device = requires_material.pop()
-                            device.materials.append(mat_lot.materials.pop())
-
-                        # Close lot if it is empty, otherwise return it to the store
-                        if mat_lot.quantity == 0:
-                            mat_lot.closed = True
-
-                        # Keep material lots while processing
-                        material_lots.append((mat_lot, q_consume))
+                    "_devices": deepcopy(lot.devices),
+                },
+            )
 
-                logger.info(
-                    f"{self.identifier} [{self.env.now}] - Start processing {lot.identifier}"
-                )
-            else:
-                # Resume processing a production lot
-                logger.info(
-                    f"{self.identifier} [{self.env.now}] - Resume processing {lot.identifier}"
+            # Consume materials (if required)
+            req_mat = lot.get_required_material()
+            material_lots = []
+            if req_mat:
+                # Keep material lots while processing
+                material_lots = yield from self.material_staging.kit(
+                    req_mat, lot.devices
                 )
-                done_in = remaining_time
 
-            start = self.env.now
-            breakdown = self.env.process(self.breakdown())
+            logger.info(
+                f"{self.identifier} [{self.env.now}] - Start processing {lot.get_name()}"
+            )
 
             # Log the consumption of materials
             logger.info(
-                f"{self.identifier} [{self.env.now}] - Consumed materials for {lot.identifier}: {[(m.identifier, q) for m,q in material_lots]} "
+                f"{self.identifier} [{self.env.now}] - Consumed materials for {lot.get_name()}: {[(m.get_name(), q) for m,q in material_lots]} "
             )
 
             input_quantity = [
@@ -130,15 +284,34 @@ class ProductionResource:
             # Reduce device quality based on process yield
             for device in lot.devices:
                 device.quality *= (
-                    1 if random() < self.process_yield else DEVICE_QUALITY_FACTOR
+                    1
+                    if self.yield_stream.random() < self.process_yield
+                    else DEVICE_QUALITY_FACTOR
+                )
+
+            # Breakdowns of the resource during processing follow from the availability timeline
+            self.state = "Processing"
+            for uptime, repair in self.availability.get_breakdowns(done_in):
+                yield self.env.timeout(uptime)
+                logger.info(f"{self.identifier} [{self.env.now}] - Breakdown")
+
+                self.state = "Broken"
+                done_in -= uptime  # remaining process time
+                yield self.env.timeout(repair)
+                logger.info(f"{self.identifier} [{self.env.now}] - Repaired")
+
+                self.state = "Processing"
+                logger.info(
+                    f"{self.identifier} [{self.env.now}] - Resume processing {lot.get_name()}"
                 )
 
-            processing = self.env.timeout(
+            yield self.env.timeout(
                 done_in,
                 value={
                     "eventType": "Transformation",
                     "bizStep": "assembling",
-                    "location": self.identifier,
+                    "location": self.location,
+                    "capability": self.capability,
                     "inputQuantity": input_quantity,
                     "outputQuantity": {
                         "amount": len(lot.devices),
@@ -151,59 +324,34 @@ class ProductionResource:
                 },
             )
 
-            self.state = "Processing"
-
-            yield processing | breakdown
-            if not breakdown.triggered:
-                breakdown.interrupt()  # stop breakdown process
-
-                # Depart shortly after assembly (and consumption of materials)
-                yield self.env.timeout(
-                    1 / 1000,
-                    value={
-                        "eventType": "Object",
-                        "bizStep": "departing",
-                        "entity": lot.identifier,
-                        "location": self.identifier,
-                        "quantity": {
-                            "amount": len(lot.devices),
-                            "class": [
-                                lot.identifier,
-                                lot.get_lot_model().identifier,
-                            ],
-                        },
-                        "_devices": deepcopy(lot.devices),
+            # Depart shortly after assembly (and consumption of materials)
+            yield self.env.timeout(
+                1 / 1000,
+                value={
+                    "eventType": "Object",
+                    "bizStep": "departing",
+                    "entity": lot.identifier,
+                    "location": self.location,
+                    "quantity": {
+                        "amount": len(lot.devices),
+                        "class": [
+                            lot.identifier,
+                            lot.get_lot_model().identifier,
+                        ],
                     },
-                )
-
-                for mat_lot, q in material_lots:
-                    if not mat_lot.closed:
-                        self.material_lot_store.put(mat_lot)
-
-                logger.info(
-                    f"{self.identifier} [{self.env.now}] - Finished processing {lot.identifier}"
-                )
+                    "_devices": deepcopy(lot.devices),
+                },
+            )
 
-                self.state = "Idle"
-                material_lots = []
-                self.lot_store.put(lot)
-            else:
-                # Breakdown of the resource
-                processing._value = None
-                remaining_time = done_in - (
-                    self.env.now - start
-                )  # remaining process time
+            if material_lots:
+                self.material_staging.release(material_lots)
 
-                self.state = "Broken"
-                yield self.env.timeout(expovariate(1 / self.mean_repair))
-                logger.info(f"{self.identifier} [{self.env.now}] - Repaired")
+            logger.info(
+                f"{self.identifier} [{self.env.now}] - Finished processing {lot.get_name()}"
+            )
 
-    def breakdown(self):
-        try:
-            yield self.env.timeout(expovariate(1 / self.mean_breakdown))
-            logger.info(f"{self.identifier} [{self.env.now}] - Breakdown")
-        except Interrupt:
-            pass
+            self.state = "Idle"
+            self.lot_store.put(lot)
 
 
 class PackingResource:
@@ -215,6 +363,11 @@ class PackingResource:
 
         self.packing_units = {}
         self.remainder = []
+        self.last_packing_time = None
+
+        self.shuffle_stream = env.random_streams.get_stream(
+            f"{self.identifier}/shuffle"
+        )
 
         self.resource_running = env.process(self.running())
 
@@ -222,7 +375,7 @@ class PackingResource:
         while True:
             # Can be extended to get lots based on product type
             lot_to_pack = yield self.packing_store.get()
-            shuffle(lot_to_pack.devices)
+            self.shuffle_stream.shuffle(lot_to_pack.devices)
 
             # Create list with lot-device pairs
             self.remainder.extend(
@@ -237,8 +390,11 @@ class PackingResource:
                 if len(devices) != self.packing_size:
                     continue
 
-                packing_unit_id = f"{lot_to_pack.identifier}_Pack{i}"
-                PackingUnit(self.env, packing_unit_id)
+                packing_unit_id = self.env.logging.symbols.derive(
+                    lot_to_pack.identifier, PACKING_UNIT, i
+                )
+                # Packing units leave the system directly
+                PackingUnit(self.env, packing_unit_id).close()
 
                 # Collect all devices per lot and 'construct' input quantities
                 input_devices = defaultdict(list)
@@ -270,7 +426,6 @@ class PackingResource:
                 )
 
                 [self.remainder.remove(d) for d in devices]
-                self.packing_units[f"{lot_to_pack.identifier}_Pack{i}"] = [
-                    d[1] for d in devices
-                ]
+                self.packing_units[packing_unit_id] = [d[1] for d in devices]
+                self.last_packing_time = self.env.now
                 i += 1
@@ -0,0 +1,59 @@
+from math import log
+from random import Random, SystemRandom
+from typing import Dict
+
+
+class RandomStream:
+    """
+    Seeded random number generator for a single purpose (e.g. the process times of one resource),
+    the interface mirrors the ``random`` module.
+    An antithetic stream uses 1 - U for every uniform U of the regular stream with the same seed
+    (shuffles are not affected).
+    """
+
+    def __init__(self, seed: str, antithetic: bool = False):
+        self.seed = seed
+        self.antithetic = antithetic
+        self.generator = Random(seed)
+
+    def expovariate(self, lambd: float) -> float:
+        u = self.generator.random()
+        if self.antithetic:
+            u = 1.0 - u if u else 0.0
+        # Inverse transform, as random.expovariate
+        return -log(1.0 - u) / lambd
+
+    def random(self) -> float:
+        u = self.generator.random()
+        if self.antithetic:
+            # Keep the uniforms in [0, 1), like the regular stream
+            return 1.0 - u if u else 0.0
+        return u
+
+    def shuffle(self, x: list):
+        self.generator.shuffle(x)
+
+
+class RandomStreams:
+    """
+    Manages the random streams of a simulation run.
+    Each stream is seeded from the run seed and its name, so the variates of a stream do not
+    depend on the other streams (or on the order in which the streams are created).
+    Runs of different configurations with the same seed therefore use common random numbers
+    for resources (and other stream owners) with the same identifier.
+    """
+
+    def __init__(self, seed: str | int = None, antithetic: bool = False):
+        self.seed = seed if seed is not None else SystemRandom().getrandbits(64)
+        self.antithetic = antithetic
+        self.streams: Dict[str, RandomStream] = {}
+
+    def get_stream(self, name: str) -> RandomStream:
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = self.create_stream(name)
+            self.streams[name] = stream
+        return stream
+
+    def create_stream(self, name: str) -> RandomStream:
+        return RandomStream(seed=f"{self.seed}/{name}", antithetic=self.antithetic)
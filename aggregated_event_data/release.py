@@ -0,0 +1,232 @@
+import logging
+
+from simpy import Container, Environment, FilterStore, Store
+from typing import Dict, List
+
+logger = logging.getLogger()
+
+from aggregated_event_data.production_entities import (
+    Device,
+    MaterialLot,
+    ProductionLot,
+)
+from aggregated_event_data.routing import RoutingPlanCompiler
+from aggregated_event_data.symbols import DEVICE
+
+RELEASE_POLICIES = ["schedule", "rate"]
+
+
+class MaterialSupplier:
+    """
+    Replenishes the material lot store on demand.
+    Orders are placed when production lots are released, material lots are only
+    created when the (cumulative) ordered quantity is not covered yet.
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        material_lot_size: int,
+        material_lot_store: FilterStore,
+        lead_time: float = 0,
+        identifier_prefix: str = "",
+    ):
+        self.env = env
+        self.material_lot_size = material_lot_size
+        self.material_lot_store = material_lot_store
+        self.lead_time = lead_time
+        self.identifier_prefix = identifier_prefix
+
+        self.ordered = {}
+        self.supplied = {}
+        self.orders = Store(env)
+
+        self.supplier_running = env.process(self.running())
+
+    def order(self, material_type: str, quantity: int):
+        self.ordered[material_type] = self.ordered.get(material_type, 0) + quantity
+        self.orders.put(material_type)
+
+    def running(self):
+        while True:
+            material_type = yield self.orders.get()
+            if self.lead_time:
+                yield self.env.timeout(self.lead_time)
+
+            # Create material lots until the ordered quantity is covered
+            while self.supplied.get(material_type, 0) < self.ordered[material_type]:
+                i = self.supplied.get(material_type, 0) // self.material_lot_size
+                material_lot = MaterialLot(
+                    env=self.env,
+                    identifier=self.env.logging.symbols.intern(
+                        f"{self.identifier_prefix}{material_type}_{i}"
+                    ),
+                    material_type=material_type,
+                    quantity=self.material_lot_size,
+                )
+                self.supplied[material_type] = (
+                    self.supplied.get(material_type, 0) + self.material_lot_size
+                )
+                self.material_lot_store.put(material_lot)
+
+
+def get_merge_groups(lot_configs: List[dict]) -> Dict[str, List[dict]]:
+    """
+    Returns the group of lots that are merged with each other by their identifier, per lot.
+    Split lots ('<id>_<index>') belong to the lot they are split from.
+    Lots that are not merged by identifier are not part of a group.
+    """
+    lot_ids = {r["id"] for r in lot_configs}
+
+    def get_lot_id(identifier: str) -> str:
+        while identifier not in lot_ids:
+            parent, _, index = identifier.rpartition("_")
+            if not parent or not index.isdigit():
+                return None
+            identifier = parent
+        return identifier
+
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(x, y):
+        parent[find(x)] = find(y)
+
+    for r in lot_configs:
+        for merge_config in r.get("merge", []):
+            for identifier in merge_config.get("lot_identifiers") or []:
+                lot_id = get_lot_id(identifier)
+                if lot_id:
+                    union(r["id"], lot_id)
+
+    groups = {}
+    for r in lot_configs:
+        if r["id"] in parent:
+            groups.setdefault(find(r["id"]), []).append(r)
+    return {
+        r["id"]: group for group in groups.values() if len(group) > 1 for r in group
+    }
+
+
+class LotRelease:
+    """
+    Releases production lots from the configuration into the factory.
+    Lots (and their devices) are only created when they are released, either at their
+    'release_time' (policy 'schedule') or with exponential inter-arrival times (policy 'rate').
+    Optionally the number of devices in the factory is limited (CONWIP), lots that are merged by
+    their identifier are released as a group: the first lot of the group takes the devices of the
+    whole group into the factory and the other lots of the group are released next.
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        lot_configs: List[dict],
+        routing_compiler: RoutingPlanCompiler,
+        lot_store: Store,
+        material_supplier: MaterialSupplier = None,
+        policy: str = "schedule",
+        mean_interarrival: float = None,
+        wip_limit: int = None,
+    ):
+        if policy not in RELEASE_POLICIES:
+            raise ValueError(
+                f"Unknown release policy '{policy}', expected one of {RELEASE_POLICIES}"
+            )
+        if policy == "rate" and not mean_interarrival:
+            raise ValueError("Release policy 'rate' requires 'mean_interarrival'")
+
+        self.env = env
+        self.lot_configs = lot_configs
+        self.routing_compiler = routing_compiler
+        self.lot_store = lot_store
+        self.material_supplier = material_supplier
+        self.policy = policy
+        self.mean_interarrival = mean_interarrival
+
+        # Devices in the factory, released when lots reach the packing store
+        self.wip = Container(env, capacity=wip_limit) if wip_limit else None
+        self.merge_groups = get_merge_groups(lot_configs) if wip_limit else {}
+        if wip_limit:
+            for r in lot_configs:
+                if r["n_devices"] > wip_limit:
+                    raise ValueError(
+                        f"Lot {r['id']} has more devices than the WIP limit {wip_limit}"
+                    )
+            for group in self.merge_groups.values():
+                if sum(r["n_devices"] for r in group) > wip_limit:
+                    raise ValueError(
+                        f"Lots {[r['id'] for r in group]} are merged and have more devices than the WIP limit {wip_limit}"
+                    )
+
+        self.arrival_stream = env.random_streams.get_stream("LotRelease/arrival")
+
+        self.released = 0
+        self.release_running = env.process(self.running())
+
+    def get_release_order(self):
+        if self.policy == "schedule":
+            order = sorted(self.lot_configs, key=lambda r: r.get("release_time", 0))
+        else:
+            order = self.lot_configs
+        if not self.merge_groups:
+            return order
+
+        # The lots of a merge group are released after the first lot of the group
+        grouped_order = []
+        released = set()
+        for r in order:
+            if r["id"] in released:
+                continue
+            group = {g["id"] for g in self.merge_groups.get(r["id"], [r])}
+            grouped_order.extend(g for g in order if g["id"] in group)
+            released.update(group)
+        return grouped_order
+
+    def running(self):
+        in_wip = set()
+        for r in self.get_release_order():
+            if self.policy == "schedule":
+                delay = r.get("release_time", 0) - self.env.now
+            else:
+                delay = self.arrival_stream.expovariate(1 / self.mean_interarrival)
+            if delay > 0:
+                yield self.env.timeout(delay)
+
+            if self.wip and r["id"] not in in_wip:
+                # The devices of a merge group are taken into the factory with its first lot
+                group = self.merge_groups.get(r["id"], [r])
+                in_wip.update(g["id"] for g in group)
+                n_devices = sum(g["n_devices"] for g in group)
+                if n_devices:
+                    yield self.wip.put(n_devices)
+
+            self.release_lot(r)
+
+    def release_lot(self, r: dict):
+        if self.material_supplier:
+            # One material unit per device
+            for m in r.get("required_material", {}).values():
+                self.material_supplier.order(m, r["n_devices"])
+
+        symbols = self.env.logging.symbols
+        identifier = symbols.intern(r["id"])
+        lot = ProductionLot(
+            env=self.env,
+            identifier=identifier,
+            plan=self.routing_compiler.compile(r),
+            devices=[
+                Device(identifier=d)
+                for d in symbols.derive_range(identifier, DEVICE, r["n_devices"])
+            ],
+        )
+        self.released += 1
+        logger.info(f"{lot.get_name()} [{self.env.now}] - Released")
+
+        self.lot_store.put(lot)
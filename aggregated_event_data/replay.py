@@ -0,0 +1,158 @@
+import argparse
+import logging
+import sys
+
+from json import load
+from pathlib import Path
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+logger = logging.getLogger()
+
+from aggregated_event_data.logging import DEFAULT_LOGS_FOLDER, SimulationEventLogging
+from aggregated_event_data.simulate import simulate
+
+
+def record(
+    config_file: str,
+    trace_file: str,
+    runtime: int,
+    random_seed: str = None,
+    antithetic: bool = False,
+    output_event_log_file: str = None,
+) -> dict:
+    """
+    Simulates the configuration and writes the trace of the captured events.
+    The trace holds the events as captured, not the decisions of the simulation: its event log
+    can be written again without simulating, but not with a changed model.
+    """
+    with open(config_file) as f:
+        config = load(f)
+
+    return simulate(
+        config,
+        runtime=runtime,
+        logging_id=f"{Path(config_file).stem}_record",
+        random_seed=random_seed,
+        antithetic=antithetic,
+        output_event_log_file=output_event_log_file,
+        trace_file=trace_file,
+    )
+
+
+def replay(trace_file: str, output_event_log_file: str = None) -> str:
+    """
+    Writes the event log of a recorded trace without simulating, and returns the path of the event log.
+    """
+    with open(trace_file) as f:
+        trace = load(f)
+
+    simulation_event_logging = SimulationEventLogging(
+        None,
+        identifier=f"{Path(trace_file).stem}_replay",
+        event_log_file=output_event_log_file,
+    )
+    simulation_event_logging.load_trace(trace)
+    simulation_event_logging.write_json_event_data()
+    return simulation_event_logging.event_log_file
+
+
+def compare_event_logs(event_log_file: str, golden_event_log_file: str) -> bool:
+    """
+    Returns whether the events of the event log are the same as the events of the golden event log.
+    """
+    with open(event_log_file) as f:
+        events = load(f)["events"]
+    with open(golden_event_log_file) as f:
+        golden_events = load(f)["events"]
+
+    for i, (event, golden_event) in enumerate(zip(events, golden_events)):
+        if event != golden_event:
+            logger.error(f"Event {i} differs from the golden event log: {event}")
+            return False
+    if len(events) != len(golden_events):
+        logger.error(
+            f"Number of events {len(events)} differs from the golden event log ({len(golden_events)})"
+        )
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="assembly_simulation_replay",
+        description="Record the trace of the captured events of a simulation, or write the event log of a recorded trace.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument(
+        "config_file", help="Path to simulation configuration file."
+    )
+    record_parser.add_argument("trace_file", help="Path to the trace (JSON) file.")
+    record_parser.add_argument(
+        "-s",
+        "--random_seed",
+        help="Seed to be used for the simulation.",
+        default=None,
+    )
+    record_parser.add_argument(
+        "-a",
+        "--antithetic",
+        help="Use antithetic random numbers.",
+        action="store_true",
+    )
+    record_parser.add_argument(
+        "-r", "--runtime", help="Maximum simulation time.", default=100
+    )
+    record_parser.add_argument(
+        "-o",
+        "--output_event_log_file",
+        help="Name/path of the out file with the event log.",
+        default=None,
+    )
+    record_parser.add_argument(
+        "-g",
+        "--golden_event_log_file",
+        help="Compare the events of the simulation with this (golden) event log.",
+        default=None,
+    )
+
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("trace_file", help="Path to the trace (JSON) file.")
+    replay_parser.add_argument(
+        "-o",
+        "--output_event_log_file",
+        help="Name/path of the out file with the event log.",
+        default=None,
+    )
+    replay_parser.add_argument(
+        "-g",
+        "--golden_event_log_file",
+        help="Compare the events with this (golden) event log.",
+        default=None,
+    )
+
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        record(
+            args.config_file,
+            args.trace_file,
+            runtime=args.runtime,
+            random_seed=args.random_seed,
+            antithetic=args.antithetic,
+            output_event_log_file=args.output_event_log_file,
+        )
+        event_log_file = args.output_event_log_file or DEFAULT_LOGS_FOLDER.joinpath(
+            f"{Path(args.config_file).stem}_record_event_log.json"
+        )
+    else:
+        event_log_file = replay(args.trace_file, args.output_event_log_file)
+
+    if args.golden_event_log_file and not compare_event_logs(
+        event_log_file, args.golden_event_log_file
+    ):
+        sys.exit(1)
@@ -0,0 +1,126 @@
+from typing import List, Tuple
+
+from aggregated_event_data.production_entities import (
+    MergeConfiguration,
+    SplitConfiguration,
+)
+from aggregated_event_data.symbols import SymbolTable
+
+
+class RoutingPlan:
+    """
+    Immutable, compiled route of a production lot, all lookups are simple tuple indexing.
+    Steps and materials are indexed by step (``i`` is the ``i``-th step of the route).
+    Merge and split configurations are indexed by position: position ``i`` refers to the
+    state of a lot after ``i`` steps have been executed.
+    Plans are shared between all lots with the same route.
+    """
+
+    def __init__(
+        self,
+        steps: Tuple[str, ...],
+        materials: Tuple[str | None, ...],
+        merge_after: Tuple[MergeConfiguration | None, ...],
+        split_after: Tuple[SplitConfiguration | None, ...],
+    ):
+        self.steps = steps
+        self.materials = materials
+        self.merge_after = merge_after
+        self.split_after = split_after
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+
+class RoutingPlanCompiler:
+    """
+    Compiles the lot routes of a simulation configuration into shared routing plans.
+    Identical routes result in the same plan object.
+    Lot identifiers in merge configurations are referenced in the symbol table of the simulation,
+    they can also name lots that are split off later on.
+    """
+
+    def __init__(self, symbols: SymbolTable):
+        self.symbols = symbols
+
+        self._plans = {}
+        self._merge_configs = {}
+        self._split_configs = {}
+
+    def get_merge_configuration(
+        self, after_step: str, lot_identifiers: List[str] = None
+    ) -> MergeConfiguration:
+        key = (after_step, tuple(lot_identifiers) if lot_identifiers else None)
+        if key not in self._merge_configs:
+            self._merge_configs[key] = MergeConfiguration(
+                after_step=after_step,
+                lot_identifiers=(
+                    [self.symbols.reference(i) for i in lot_identifiers]
+                    if lot_identifiers
+                    else lot_identifiers
+                ),
+            )
+        return self._merge_configs[key]
+
+    def get_split_configuration(
+        self, after_step: str, number_of_split_lots: int
+    ) -> SplitConfiguration:
+        key = (after_step, number_of_split_lots)
+        if key not in self._split_configs:
+            self._split_configs[key] = SplitConfiguration(
+                after_step=after_step, number_of_split_lots=number_of_split_lots
+            )
+        return self._split_configs[key]
+
+    def compile(self, lot_config: dict) -> RoutingPlan:
+        """
+        Returns the (shared) routing plan for a production lot configuration entry.
+        """
+        step_names = tuple(lot_config["steps"])
+        required_material = lot_config.get("required_material", {})
+        merge_configs = [
+            self.get_merge_configuration(**config)
+            for config in lot_config.get("merge", [])
+        ]
+        split_configs = [
+            self.get_split_configuration(**config)
+            for config in lot_config.get("split", [])
+        ]
+
+        key = (
+            step_names,
+            tuple(required_material.get(step) for step in step_names),
+            tuple(id(config) for config in merge_configs),
+            tuple(id(config) for config in split_configs),
+        )
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._build_plan(
+                step_names, required_material, merge_configs, split_configs
+            )
+            self._plans[key] = plan
+        return plan
+
+    def _build_plan(
+        self,
+        step_names: Tuple[str, ...],
+        required_material: dict,
+        merge_configs: List[MergeConfiguration],
+        split_configs: List[SplitConfiguration],
+    ) -> RoutingPlan:
+        # Position 0 corresponds to a lot without any executed steps
+        executed = ("",) + step_names
+
+        def configs_after(configs):
+            # Only the first configuration for a step is applied
+            after = {}
+            for config in configs:
+                after.setdefault(config.after_step, config)
+            return tuple(after.get(step) for step in executed)
+
+        return RoutingPlan(
+            steps=step_names,
+            materials=tuple(required_material.get(step) for step in step_names),
+            merge_after=configs_after(merge_configs),
+            split_after=configs_after(split_configs),
+        )
@@ -0,0 +1,379 @@
+import argparse
+import logging
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from heapq import merge
+from json import load
+from pathlib import Path
+from simpy import Environment, Store
+from typing import Dict, List, Tuple
+
+path_root = Path(__file__).parents[1]
+sys.path.append(str(path_root))
+
+logger = logging.getLogger()
+
+from aggregated_event_data.logging import (
+    DEFAULT_LOGS_FOLDER,
+    SimulationEventLogging,
+    write_json_event_log,
+)
+from aggregated_event_data.production_entities import Device, Product
+from aggregated_event_data.production_resources import PackingResource
+from aggregated_event_data.random_streams import RandomStream, RandomStreams
+from aggregated_event_data.simulate import create_production
+
+# Streams that are used by the whole factory in a single process simulation
+FACTORY_STREAMS = ["Controller/split", "LotRelease/arrival"]
+
+
+class AreaRandomStreams(RandomStreams):
+    """
+    Random streams of a production area. Factory streams are seeded per area, so the areas do not
+    draw the same (correlated) sequences; the streams of resources are not affected.
+    """
+
+    def __init__(self, seed: str, area: str):
+        super().__init__(seed)
+        self.area = area
+
+    def create_stream(self, name: str) -> RandomStream:
+        if name in FACTORY_STREAMS:
+            return RandomStream(
+                seed=f"{self.seed}/{self.area}/{name}", antithetic=self.antithetic
+            )
+        return super().create_stream(name)
+
+
+class TransferredLot:
+    """
+    Finished production lot transferred from a production area to the packing area.
+    """
+
+    def __init__(self, identifier: int, lot_model: Product, devices: List[Device]):
+        self.identifier = identifier
+        self.lot_model = lot_model
+        self.devices = devices
+
+    def get_lot_model(self) -> Product:
+        return self.lot_model
+
+
+def partition_config(config: dict, n_areas: int) -> List[dict]:
+    """
+    Partitions the configuration into (at most) n_areas independent production areas.
+    Lots that share a capability or are merged with each other are placed in the same area,
+    so areas only interact through the (downstream) packing area.
+    """
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(x, y):
+        parent[find(x)] = find(y)
+
+    for r in config["production_lots"]:
+        lot = ("lot", r["id"])
+        find(lot)
+        for step in r["steps"]:
+            union(lot, ("step", step))
+        for merge_config in r.get("merge", []):
+            if merge_config.get("lot_identifiers"):
+                for lot_id in merge_config["lot_identifiers"]:
+                    union(lot, ("lot", lot_id))
+            else:
+                # Lots can be merged with any other lot of the same model
+                union(lot, ("merge", "model"))
+
+    # Group lots by component, the load of a component is the number of device steps
+    components = {}
+    for r in config["production_lots"]:
+        component = components.setdefault(
+            find(("lot", r["id"])), {"lots": [], "steps": set(), "load": 0}
+        )
+        component["lots"].append(r)
+        component["steps"].update(r["steps"])
+        component["load"] += r["n_devices"] * len(r["steps"])
+
+    # Assign the largest components first to the area with the lowest load
+    areas = [{"lots": [], "steps": set(), "load": 0} for _ in range(n_areas)]
+    for component in sorted(components.values(), key=lambda c: -c["load"]):
+        area = min(areas, key=lambda a: a["load"])
+        area["lots"].extend(component["lots"])
+        area["steps"].update(component["steps"])
+        area["load"] += component["load"]
+
+    area_configs = []
+    for area in areas:
+        if not area["lots"]:
+            continue
+        area_config = {
+            k: v
+            for k, v in config.items()
+            if k not in ["production_lots", "production_resources"]
+        }
+        area_config["production_lots"] = area["lots"]
+        area_config["production_resources"] = [
+            r for r in config["production_resources"] if r["step"] in area["steps"]
+        ]
+        area_configs.append(area_config)
+    return area_configs
+
+
+def get_release_times(config: dict, random_seed: str) -> Dict[str, float]:
+    """
+    Returns the release time per lot for release policy 'rate', drawn from the same
+    random stream as in a single process simulation.
+    """
+    arrival_stream = RandomStreams(random_seed).get_stream("LotRelease/arrival")
+    mean_interarrival = config["release"]["mean_interarrival"]
+
+    release_times = {}
+    t = 0
+    for r in config["production_lots"]:
+        t += arrival_stream.expovariate(1 / mean_interarrival)
+        release_times[r["id"]] = t
+    return release_times
+
+
+def simulate_area(
+    config: dict, runtime: int, logging_id: str, random_seed: str, area: str
+) -> Tuple[List[dict], List[dict], List[dict], List[tuple]]:
+    """
+    Simulates one production area and returns its events, entities, products and the
+    lots (with time) that are transferred to the packing area. Identifiers are exported
+    as strings, the symbol tables of the processes are independent.
+    """
+    env = Environment()
+    env.random_streams = AreaRandomStreams(random_seed, area)
+    simulation_event_logging = SimulationEventLogging(env, identifier=logging_id)
+    env.logging = simulation_event_logging
+
+    lot_release, packing_store = create_production(
+        env, config, material_lot_prefix=f"{area}_"
+    )
+
+    transfers = []
+
+    def transferring():
+        while True:
+            lot = yield packing_store.get()
+            transfers.append(
+                (env.now, lot.identifier, lot.get_lot_model(), lot.devices)
+            )
+
+    env.process(transferring())
+    env.run(runtime)
+
+    simulation_event_logging.export_events()
+    for e in simulation_event_logging.event_list:
+        e["eventIdentifier"] = f"{area}/{e['eventIdentifier']}"
+
+    cache = {}
+    symbols = simulation_event_logging.symbols
+    transfers = [
+        (
+            t,
+            symbols.resolve(identifier, cache),
+            lot_model,
+            [simulation_event_logging.export_device(d, cache) for d in devices],
+        )
+        for t, identifier, lot_model, devices in transfers
+    ]
+
+    return (
+        simulation_event_logging.event_list,
+        simulation_event_logging.get_entity_records(),
+        simulation_event_logging.get_product_records(),
+        transfers,
+    )
+
+
+def simulate_packing(
+    config: dict,
+    runtime: int,
+    logging_id: str,
+    random_seed: str,
+    transfers: List[tuple],
+) -> Tuple[List[dict], List[dict], PackingResource]:
+    """
+    Simulates the packing area, fed by the (time ordered) lots of all production areas.
+    """
+    env = Environment()
+    env.random_streams = RandomStreams(random_seed)
+    simulation_event_logging = SimulationEventLogging(env, identifier=logging_id)
+    env.logging = simulation_event_logging
+
+    packing_store = Store(env)
+    packing_resource = PackingResource(env, config["packing_unit_size"], packing_store)
+
+    def import_device(device: dict) -> Device:
+        symbols = simulation_event_logging.symbols
+        imported = Device(identifier=symbols.intern(device["identifier"]))
+        imported.materials = [symbols.intern(m) for m in device["materials"]]
+        imported.quality = device["quality"]
+        return imported
+
+    def feeding():
+        for t, identifier, lot_model, devices in transfers:
+            if t > env.now:
+                yield env.timeout(t - env.now)
+            packing_store.put(
+                TransferredLot(
+                    simulation_event_logging.symbols.intern(identifier),
+                    lot_model,
+                    [import_device(d) for d in devices],
+                )
+            )
+
+    env.process(feeding())
+    env.run(runtime)
+
+    simulation_event_logging.export_events()
+    for e in simulation_event_logging.event_list:
+        e["eventIdentifier"] = f"Packing/{e['eventIdentifier']}"
+
+    return (
+        simulation_event_logging.event_list,
+        simulation_event_logging.get_entity_records(),
+        packing_resource,
+    )
+
+
+def simulate_sharded(
+    config: dict,
+    runtime: int,
+    logging_id: str,
+    random_seed: str = None,
+    n_areas: int = None,
+    processes: int = None,
+    output_event_log_file: str = None,
+) -> dict:
+    """
+    Simulates the production areas of the configuration in parallel processes, followed by
+    the packing area, and writes one (time ordered) event log.
+    Material lots are supplied per area, so material lot identifiers are prefixed with the area.
+    """
+    release_config = config.get("release", {})
+    if release_config.get("wip_limit"):
+        raise ValueError("A WIP limit is not supported in a sharded simulation")
+
+    # Seed is required to synchronize the random streams of all processes
+    if random_seed is None:
+        random_seed = str(RandomStreams().seed)
+
+    config = deepcopy(config)
+    if release_config.get("policy") == "rate":
+        release_times = get_release_times(config, random_seed)
+        for r in config["production_lots"]:
+            r["release_time"] = release_times[r["id"]]
+        config["release"] = {"policy": "schedule"}
+
+    area_configs = partition_config(config, n_areas or processes or os.cpu_count())
+    logger.info(f"{logging_id} - Simulating {len(area_configs)} production area(s)")
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = list(
+            executor.map(
+                simulate_area,
+                area_configs,
+                [runtime] * len(area_configs),
+                [f"{logging_id}_area{i}" for i in range(len(area_configs))],
+                [random_seed] * len(area_configs),
+                [f"Area{i}" for i in range(len(area_configs))],
+            )
+        )
+
+    transfers = list(merge(*[r[3] for r in results], key=lambda t: t[0]))
+    packing_events, packing_entities, packing_resource = simulate_packing(
+        config,
+        runtime=runtime,
+        logging_id=f"{logging_id}_packing",
+        random_seed=random_seed,
+        transfers=transfers,
+    )
+
+    events = list(
+        merge(*[r[0] for r in results], packing_events, key=lambda e: e["timestamp"])
+    )
+    entities = [e for r in results for e in r[1]] + packing_entities
+    products = list({p["identifier"]: p for r in results for p in r[2]}.values())
+
+    write_json_event_log(
+        output_event_log_file
+        or DEFAULT_LOGS_FOLDER.joinpath(f"{logging_id}_event_log.json"),
+        events=events,
+        aggregated_entities=entities,
+        products=products,
+    )
+
+    packed_devices = [
+        d for devices in packing_resource.packing_units.values() for d in devices
+    ]
+    return {
+        "areas": len(area_configs),
+        "packing_units": len(packing_resource.packing_units),
+        "packed_devices": len(packed_devices),
+        "makespan": packing_resource.last_packing_time or 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="assembly_simulation_sharded",
+        description="Simulate independent production areas in parallel processes.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument("config_file", help="Path to simulation configuration file.")
+    parser.add_argument(
+        "-s",
+        "--random_seed",
+        help="Seed to be used for the simulation.",
+        default=None,
+    )
+    parser.add_argument(
+        "-o",
+        "--output_event_log_file",
+        help="Name/path of the out file with the event log.",
+        default=None,
+    )
+    parser.add_argument("-r", "--runtime", help="Maximum simulation time.", default=100)
+    parser.add_argument(
+        "-n",
+        "--areas",
+        help="Maximum number of production areas (default: number of processes).",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        help="Number of processes (default: number of cores).",
+        type=int,
+        default=None,
+    )
+
+    args = parser.parse_args()
+
+    with open(args.config_file) as f:
+        config = load(f)
+
+    logging_id = f"{Path(args.config_file).stem}{'_'+args.random_seed if args.random_seed else ''}"
+    kpis = simulate_sharded(
+        config,
+        runtime=args.runtime,
+        logging_id=logging_id,
+        random_seed=args.random_seed,
+        n_areas=args.areas,
+        processes=args.processes,
+        output_event_log_file=args.output_event_log_file,
+    )
+    logger.info(kpis)
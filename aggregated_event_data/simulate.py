@@ -4,10 +4,9 @@ import sys
 
 from collections import defaultdict
 from json import load
-from math import ceil
 from pathlib import Path
-from random import seed
 from simpy import Environment, FilterStore, Store
+from typing import Tuple
 
 path_root = Path(__file__).parents[1]
 sys.path.append(str(path_root))
@@ -16,14 +15,15 @@ logger = logging.getLogger()
 
 from aggregated_event_data.controller import Controller
 from aggregated_event_data.logging import SimulationEventLogging
-from aggregated_event_data.production_entities import (
-    Device,
-    MaterialLot,
-    MergeConfiguration,
-    ProductionLot,
-    SplitConfiguration,
+from aggregated_event_data.production_resources import (
+    MaterialStaging,
+    PackingResource,
+    ProductionResource,
 )
-from aggregated_event_data.production_resources import PackingResource, ProductionResource
+from aggregated_event_data.random_streams import RandomStreams
+from aggregated_event_data.release import LotRelease, MaterialSupplier
+from aggregated_event_data.routing import RoutingPlanCompiler
+from aggregated_event_data.streaming import EventStreamServer
 
 
 def main(
@@ -31,64 +31,148 @@ def main(
     runtime: int,
     random_seed: int = None,
     output_event_log_file: str = None,
+    antithetic: bool = False,
+    stream_address: str = None,
+    pace: float = None,
+    min_subscribers: int = 0,
+    spill_closed_entities: bool = False,
 ):
     with open(config_file) as f:
         config = load(f)
 
-    if random_seed:
-        seed(random_seed)
+    logging_id = f"{Path(config_file).stem}{'_'+random_seed if random_seed else ''}"
+    if antithetic:
+        logging_id += "_antithetic"
+
+    event_stream = None
+    if stream_address:
+        event_stream = EventStreamServer(
+            stream_address, pace=pace, min_subscribers=min_subscribers
+        )
+        event_stream.start()
 
-    # Instantiate environment and logging
+    try:
+        simulate(
+            config,
+            runtime=runtime,
+            logging_id=logging_id,
+            random_seed=random_seed,
+            antithetic=antithetic,
+            output_event_log_file=output_event_log_file,
+            event_stream=event_stream,
+            spill_closed_entities=spill_closed_entities,
+        )
+    finally:
+        if event_stream:
+            event_stream.close()
+
+
+def simulate(
+    config: dict,
+    runtime: int,
+    logging_id: str,
+    random_seed: int = None,
+    antithetic: bool = False,
+    output_event_log_file: str = None,
+    write_event_log: bool = True,
+    event_stream: EventStreamServer = None,
+    spill_closed_entities: bool = False,
+    random_streams: RandomStreams = None,
+    trace_file: str = None,
+) -> dict:
+    """
+    Runs a single replication of the simulation configuration and returns its KPIs.
+    Optionally writes the trace of the captured events, see replay.py.
+    """
+    # Instantiate environment, random streams and logging
     env = Environment()
-    logging_id = f"{Path(config_file).stem}{'_'+random_seed if random_seed else ''}"
+    env.random_streams = random_streams or RandomStreams(
+        random_seed, antithetic=antithetic
+    )
     simulation_event_logging = SimulationEventLogging(
-        env, identifier=logging_id, event_log_file=output_event_log_file
+        env,
+        identifier=logging_id,
+        event_log_file=output_event_log_file,
+        event_stream=event_stream,
+        spill_closed_entities=spill_closed_entities,
     )
     env.logging = simulation_event_logging
 
-    production_lots = [
-        ProductionLot(
-            env=env,
-            identifier=r["id"],
-            required_steps=r["steps"],
-            required_material=r.get("required_material", dict()),
-            merge_configs=[
-                MergeConfiguration(**config) for config in r.get("merge", [])
-            ],
-            split_configs=[
-                SplitConfiguration(**config) for config in r.get("split", [])
-            ],
-            devices=[
-                Device(identifier=f"{r['id']}_Device{d}") for d in range(r["n_devices"])
-            ],
-        )
-        for r in config["production_lots"]
-    ]
+    lot_release, packing_store = create_production(env, config)
+    packing_resource = PackingResource(env, config["packing_unit_size"], packing_store)
 
-    # Generate material lots based on required materials
-    required_materials = defaultdict(int)
-    for r in config["production_lots"]:
-        for m in r.get("required_material", {}).values():
-            required_materials[m] += r["n_devices"]  # one material unit per device
-
-    material_lots = []
-    for m, q in required_materials.items():
-        material_lots.extend(
-            [
-                MaterialLot(
-                    env=env,
-                    identifier=f"{m}_{i}",
-                    material_type=m,
-                    quantity=config["material_lot_size"],
-                )
-                for i in range(ceil(q / config["material_lot_size"]))
-            ]
-        )
+    env.run(runtime)
+    logging.info(
+        {
+            simulation_event_logging.symbols.resolve(packing_unit): devices
+            for packing_unit, devices in packing_resource.packing_units.items()
+        }
+    )
+
+    if trace_file:
+        simulation_event_logging.write_trace(trace_file)
+    if write_event_log:
+        simulation_event_logging.write_json_event_data()
+    simulation_event_logging.close()
+
+    return get_kpis(lot_release, packing_resource)
+
+
+def create_production(
+    env: Environment, config: dict, material_lot_prefix: str = ""
+) -> Tuple[LotRelease, Store]:
+    """
+    Creates the lot release, material supply, production resources and controller of the configuration.
+    Returns the lot release and the store to which finished lots are sent for packing.
+    """
+    # Compile the lot routes into shared routing plans
+    routing_compiler = RoutingPlanCompiler(env.logging.symbols)
 
     production_lots_store = Store(env)
-    production_lots_store.items = production_lots
     material_lots_store = FilterStore(env)
-    material_lots_store.items = material_lots
+
+    # Material lots are supplied when the production lots requiring them are released
+    material_supplier = MaterialSupplier(
+        env,
+        material_lot_size=config.get("material_lot_size", 1),
+        material_lot_store=material_lots_store,
+        lead_time=config.get("material_lead_time", 0),
+        identifier_prefix=material_lot_prefix,
+    )
+
+    # Production lots are created when they are released
+    release_config = config.get("release", {})
+    lot_release = LotRelease(
+        env,
+        lot_configs=config["production_lots"],
+        routing_compiler=routing_compiler,
+        lot_store=production_lots_store,
+        material_supplier=material_supplier,
+        policy=release_config.get("policy", "schedule"),
+        mean_interarrival=release_config.get("mean_interarrival"),
+        wip_limit=release_config.get("wip_limit"),
+    )
+
+    # Material lots are staged per capability, material types consumed at only one
+    # capability stay staged there
+    material_steps = defaultdict(set)
+    for r in config["production_lots"]:
+        for step, m in r.get("required_material", {}).items():
+            material_steps[m].add(step)
+
+    staging_config = config.get("material_staging", {})
+    material_stagings = {
+        step: MaterialStaging(
+            env,
+            material_lots_store,
+            exclusive_material_types={
+                m for m, steps in material_steps.items() if steps == {step}
+            },
+            reorder_point=staging_config.get("reorder_point", 0),
+            max_lots=staging_config.get("max_lots", 0),
+        )
+        for step in {r["step"] for r in config["production_resources"]}
+    }
 
     production_resources = [
         ProductionResource(
@@ -100,7 +184,7 @@ def main(
             mean_breakdown=r["mean_breakdown"],
             mean_repair=r["mean_repair"],
             lot_store=production_lots_store,
-            material_lot_store=material_lots_store,
+            material_staging=material_stagings[r["step"]],
             process_yield=r.get("process_yield", 1),
         )
         for r in config["production_resources"]
@@ -111,16 +195,33 @@ def main(
         production_resources_dict[resource.capability].append(resource)
 
     packing_store = Store(env)
-    packing_resource = PackingResource(env, config["packing_unit_size"], packing_store)
 
     controller = Controller(
-        env, production_resources_dict, production_lots_store, packing_store
+        env,
+        production_resources_dict,
+        production_lots_store,
+        packing_store,
+        wip=lot_release.wip,
     )
 
-    env.run(runtime)
-    logging.info(packing_resource.packing_units)
+    return lot_release, packing_store
 
-    simulation_event_logging.write_json_event_data()
+
+def get_kpis(lot_release: LotRelease, packing_resource: PackingResource) -> dict:
+    packed_devices = [
+        d for devices in packing_resource.packing_units.values() for d in devices
+    ]
+    return {
+        "released_lots": lot_release.released,
+        "packing_units": len(packing_resource.packing_units),
+        "packed_devices": len(packed_devices),
+        "makespan": packing_resource.last_packing_time or 0,
+        "mean_quality": (
+            sum(d.quality for d in packed_devices) / len(packed_devices)
+            if packed_devices
+            else 0
+        ),
+    }
 
 
 if __name__ == "__main__":
@@ -143,6 +244,35 @@ if __name__ == "__main__":
         default=None,
     )
     parser.add_argument("-r", "--runtime", help="Maximum simulation time.", default=100)
+    parser.add_argument(
+        "-a",
+        "--antithetic",
+        help="Use antithetic random numbers.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stream_address",
+        help="Stream the events live to subscribers, 'tcp://<host>:<port>' or 'unix://<path>'.",
+        default=None,
+    )
+    parser.add_argument(
+        "--pace",
+        help="Pace the simulation to wall-clock time (simulation time units per second).",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--min_subscribers",
+        help="Number of stream subscribers to wait for before starting the simulation.",
+        type=int,
+        default=0,
+    )
+
+    parser.add_argument(
+        "--spill_closed_entities",
+        help="Move the records of closed lots to disk during the simulation.",
+        action="store_true",
+    )
 
     args = parser.parse_args()
 
@@ -151,4 +281,9 @@ if __name__ == "__main__":
         runtime=args.runtime,
         random_seed=args.random_seed,
         output_event_log_file=args.output_event_log_file,
+        antithetic=args.antithetic,
+        stream_address=args.stream_address,
+        pace=args.pace,
+        min_subscribers=args.min_subscribers,
+        spill_closed_entities=args.spill_closed_entities,
     )
@@ -0,0 +1,327 @@
+import asyncio
+import logging
+import threading
+import time
+
+from collections import deque
+from json import dumps, loads
+from typing import List
+
+logger = logging.getLogger()
+
+STREAM_POLICIES = ["drop", "block"]
+DEFAULT_QUEUE_SIZE = 1000
+# Messages buffered beyond the queue (policy 'block'), relative to the queue size
+OVERFLOW_FACTOR = 10
+
+# Seconds to wait for subscribers to receive the remaining events when closing the server
+CLOSE_TIMEOUT = 5
+
+_END_OF_STREAM = None
+
+
+def get_kpi_delta(event: dict) -> dict:
+    """
+    Returns the change of the (cumulative) KPIs caused by the event.
+    """
+    delta = {"events": 1}
+    biz_step = event.get("bizStep")
+    if biz_step == "creating_class_instance":
+        delta["created_lots"] = 1
+    elif biz_step == "arriving":
+        delta["started_jobs"] = 1
+    elif biz_step == "assembling":
+        delta["finished_jobs"] = 1
+    elif biz_step == "packing":
+        delta["packing_units"] = 1
+        delta["packed_devices"] = len(event.get("_devices", []))
+    return delta
+
+
+def is_size(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+class Subscriber:
+    """
+    Client of the event stream with its own bounded queue.
+    When the queue is full new messages are either dropped (policy 'drop') or kept in a bounded
+    overflow buffer until the subscriber catches up (policy 'block'). A subscriber that exceeds
+    its overflow buffer is disconnected; the simulation itself never waits.
+    """
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        filters: dict = None,
+        policy: str = "drop",
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        kpis: bool = True,
+        overflow_size: int = None,
+    ):
+        if policy not in STREAM_POLICIES:
+            raise ValueError(
+                f"Unknown stream policy '{policy}', expected one of {STREAM_POLICIES}"
+            )
+        # A queue of size 0 would be unbounded
+        if not is_size(queue_size):
+            raise ValueError(
+                f"'queue_size' must be a positive integer, got {queue_size}"
+            )
+        if overflow_size is not None and not is_size(overflow_size):
+            raise ValueError(
+                f"'overflow_size' must be a positive integer, got {overflow_size}"
+            )
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError(f"'filter' must be a JSON object, got {filters}")
+
+        self.writer = writer
+        self.filters = {
+            k: set(v) if isinstance(v, list) else {v}
+            for k, v in (filters or {}).items()
+        }
+        self.policy = policy
+        self.kpis = kpis
+
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflow = deque()
+        self.overflow_size = overflow_size or OVERFLOW_FACTOR * queue_size
+        self.overflowed = False
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        return all(event.get(k) in values for k, values in self.filters.items())
+
+    def offer(self, message: bytes | None, force: bool = False):
+        if self.overflowed:
+            return
+        if not self.overflow:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except asyncio.QueueFull:
+                pass
+
+        if force:
+            self.overflow.append(message)
+        elif self.policy == "block":
+            if len(self.overflow) >= self.overflow_size:
+                self.disconnect()
+            else:
+                self.overflow.append(message)
+        else:
+            self.dropped += 1
+
+    def disconnect(self):
+        """
+        Discards the buffered messages and ends the stream of the subscriber (overflow exceeded).
+        """
+        self.overflowed = True
+        self.overflow.clear()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_END_OF_STREAM)
+
+    async def sending(self):
+        while True:
+            message = await self.queue.get()
+            while self.overflow and not self.queue.full():
+                self.queue.put_nowait(self.overflow.popleft())
+
+            if self.dropped:
+                self.writer.write(
+                    (dumps({"kind": "dropped", "count": self.dropped}) + "\n").encode()
+                )
+                self.dropped = 0
+            if message is _END_OF_STREAM:
+                if self.overflowed:
+                    self.writer.write(
+                        (
+                            dumps(
+                                {
+                                    "kind": "error",
+                                    "message": "Overflow buffer exceeded, subscriber is disconnected",
+                                }
+                            )
+                            + "\n"
+                        ).encode()
+                    )
+                    await self.writer.drain()
+                break
+
+            self.writer.write(message)
+            await self.writer.drain()
+
+
+class EventStreamServer:
+    """
+    Local asyncio server that streams the simulation events (and KPI deltas) to subscribers
+    as newline delimited JSON. The server runs in a separate thread with its own event loop.
+
+    Addresses are either 'tcp://<host>:<port>' or 'unix://<path>'. A subscriber first sends one
+    JSON line with its subscription, e.g. {"filter": {"eventType": ["Transformation"]}, "policy": "drop", "kpis": true}.
+    Optionally the simulation is paced to wall-clock time (pace = simulation time units per second).
+    """
+
+    def __init__(
+        self,
+        address: str,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        pace: float = None,
+        min_subscribers: int = 0,
+    ):
+        self.address = address
+        self.queue_size = queue_size
+        self.pace = pace
+        self.min_subscribers = min_subscribers
+
+        self.subscribers: List[Subscriber] = []
+        self.subscribers_ready = threading.Event()
+        self.started = threading.Event()
+        self.wall_clock_start = None
+
+        self.loop = None
+        self.thread = None
+        self.tasks = set()
+        self.error = None  # raised in start(), e.g. when the address cannot be bound
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait()
+        if self.error:
+            self.thread.join()
+            raise self.error
+
+        if self.min_subscribers:
+            logger.info(
+                f"{self.address} - Waiting for {self.min_subscribers} subscriber(s)"
+            )
+            self.subscribers_ready.wait()
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self.serving())
+        except Exception as e:
+            self.error = e
+            self.started.set()
+        finally:
+            self.loop.close()
+
+    async def serving(self):
+        self.stopped = asyncio.Event()
+        if self.address.startswith("unix://"):
+            server = await asyncio.start_unix_server(
+                self.subscribe, path=self.address[len("unix://") :]
+            )
+        else:
+            host, port = self.address.removeprefix("tcp://").rsplit(":", 1)
+            server = await asyncio.start_server(self.subscribe, host, int(port))
+
+        logger.info(f"{self.address} - Streaming events")
+        self.started.set()
+        await self.stopped.wait()
+
+        server.close()
+        await server.wait_closed()
+
+    async def subscribe(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            subscription = loads(await reader.readline() or "{}")
+            if not isinstance(subscription, dict):
+                raise ValueError(
+                    f"Subscription must be a JSON object, got {subscription}"
+                )
+            subscriber = Subscriber(
+                writer,
+                filters=subscription.get("filter"),
+                policy=subscription.get("policy", "drop"),
+                queue_size=subscription.get("queue_size", self.queue_size),
+                kpis=subscription.get("kpis", True),
+                overflow_size=subscription.get("overflow_size"),
+            )
+        except (TypeError, ValueError) as e:
+            writer.write((dumps({"kind": "error", "message": str(e)}) + "\n").encode())
+            await self.closing_writer(writer)
+            return
+
+        self.subscribers.append(subscriber)
+        if len(self.subscribers) >= self.min_subscribers:
+            self.subscribers_ready.set()
+
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            await subscriber.sending()
+        except ConnectionError:
+            logger.info(f"{self.address} - Subscriber disconnected")
+        finally:
+            self.tasks.discard(task)
+            self.subscribers.remove(subscriber)
+            await self.closing_writer(writer)
+
+    async def closing_writer(self, writer: asyncio.StreamWriter):
+        """
+        Closes the connection after the buffered messages are sent, before the event loop stops.
+        """
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    def publish(self, event: dict):
+        """
+        Hands the (exported) event over to the server thread, called from the simulation thread.
+        """
+        if not self.subscribers:
+            return
+
+        # Serialize in the simulation thread, devices may change later on
+        message = (dumps({"kind": "event", "event": event}) + "\n").encode()
+        kpi_message = (
+            dumps(
+                {
+                    "kind": "kpi",
+                    "timestamp": event["timestamp"],
+                    "delta": get_kpi_delta(event),
+                }
+            )
+            + "\n"
+        ).encode()
+        self.loop.call_soon_threadsafe(self.distribute, event, message, kpi_message)
+
+    def distribute(self, event: dict, message: bytes, kpi_message: bytes):
+        for subscriber in self.subscribers:
+            if subscriber.matches(event):
+                subscriber.offer(message)
+            if subscriber.kpis:
+                subscriber.offer(kpi_message)
+
+    def wait_for(self, t: float):
+        """
+        Waits until the wall-clock time corresponding to simulation time t (pacing mode).
+        """
+        if not self.pace:
+            return
+        if self.wall_clock_start is None:
+            self.wall_clock_start = time.monotonic() - t / self.pace
+        delay = self.wall_clock_start + t / self.pace - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def closing(self):
+        end = (dumps({"kind": "end"}) + "\n").encode()
+        for subscriber in self.subscribers:
+            subscriber.offer(end, force=True)
+            subscriber.offer(_END_OF_STREAM, force=True)
+        if self.tasks:
+            await asyncio.wait(self.tasks, timeout=CLOSE_TIMEOUT)
+        self.stopped.set()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.closing(), self.loop).result()
+        self.thread.join()
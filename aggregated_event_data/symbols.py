@@ -0,0 +1,123 @@
+from array import array
+from typing import Dict
+
+# Kinds of identifiers, derived identifiers are '<parent><separator><index>'
+NAME = 0
+DEVICE = 1
+MATERIAL = 2
+SPLIT = 3
+PACKING_UNIT = 4
+
+SEPARATORS = {
+    DEVICE: "_Device",
+    MATERIAL: "_Material",
+    SPLIT: "_",
+    PACKING_UNIT: "_Pack",
+}
+
+
+class SymbolTable:
+    """
+    Compact integer identifiers for the entities, devices, materials and locations of a simulation.
+    An identifier is either a name (e.g. from the configuration) or derived from a parent identifier
+    and an index (e.g. the devices of a lot). Derived identifiers are stored as integers only,
+    their strings are built when they are resolved at export.
+    """
+
+    def __init__(self):
+        self.kinds = bytearray()
+        self.parents = array("q")
+        self.indices = array("q")
+
+        self.names: Dict[int, str] = {}
+        self.name_ids: Dict[str, int] = {}
+
+        # Names of split lots that are referenced before the lots exist (e.g. in merge configurations)
+        self.references: Dict[str, int] = {}
+
+    @classmethod
+    def from_dict(cls, table: dict) -> "SymbolTable":
+        symbols = cls()
+        symbols.kinds.extend(table["kinds"])
+        symbols.parents.extend(table["parents"])
+        symbols.indices.extend(table["indices"])
+        for identifier, name in table["names"]:
+            symbols.names[identifier] = name
+            symbols.name_ids[name] = identifier
+        symbols.references.update(table["references"])
+        return symbols
+
+    def to_dict(self) -> dict:
+        return {
+            "kinds": list(self.kinds),
+            "parents": self.parents.tolist(),
+            "indices": self.indices.tolist(),
+            "names": list(self.names.items()),
+            "references": self.references,
+        }
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def add(self, kind: int, parent: int, index: int) -> int:
+        self.kinds.append(kind)
+        self.parents.append(parent)
+        self.indices.append(index)
+        return len(self.kinds) - 1
+
+    def intern(self, name: str) -> int:
+        """
+        Returns the identifier of the name, the same name always results in the same identifier.
+        """
+        identifier = self.name_ids.get(name)
+        if identifier is None:
+            identifier = self.add(NAME, -1, -1)
+            self.names[identifier] = name
+            self.name_ids[name] = identifier
+        return identifier
+
+    def reference(self, name: str) -> int:
+        """
+        Returns the identifier of the name of a lot that may be split off later on,
+        the split lot gets the same identifier.
+        """
+        identifier = self.intern(name)
+        self.references[name] = identifier
+        return identifier
+
+    def derive(self, parent: int, kind: int, index: int) -> int:
+        if kind == SPLIT and self.references:
+            name = self.resolve(parent) + SEPARATORS[kind] + str(index)
+            if name in self.references:
+                return self.references[name]
+        return self.add(kind, parent, index)
+
+    def derive_range(self, parent: int, kind: int, n: int) -> range:
+        """
+        Returns n consecutive identifiers derived from the parent, with indices 0..n-1.
+        """
+        start = len(self.kinds)
+        for i in range(n):
+            self.add(kind, parent, i)
+        return range(start, start + n)
+
+    def resolve(self, identifier: int, cache: Dict[int, str] = None) -> str:
+        """
+        Returns the string of the identifier, optionally using (and filling) a cache of resolved strings.
+        """
+        if cache is not None and identifier in cache:
+            return cache[identifier]
+
+        kind = self.kinds[identifier]
+        if kind == NAME:
+            name = self.names[identifier]
+        else:
+            name = (
+                self.resolve(self.parents[identifier], cache)
+                + SEPARATORS[kind]
+                + str(self.indices[identifier])
+            )
+
+        if cache is not None:
+            cache[identifier] = name
+        return name
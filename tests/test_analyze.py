@@ -0,0 +1,36 @@
+from copy import deepcopy
+from json import load
+from pathlib import Path
+
+from aggregated_event_data.analyze import analyze
+from aggregated_event_data.simulate import simulate
+
+
+def test_reports_of_split_event_log(tmp_path):
+    """
+    The reports do not depend on the number of parts the event log is split into,
+    also when jobs start in one part and finish in another.
+    """
+    with open(Path(__file__).parents[1] / "examples" / "example_1.json") as f:
+        config = load(f)
+    lots = []
+    for i in range(40):
+        lot = deepcopy(config["production_lots"][i % len(config["production_lots"])])
+        lot["id"] = f"Lot{i}"
+        lot.pop("merge", None)
+        lots.append(lot)
+    config["production_lots"] = lots
+
+    event_log_file = tmp_path / "event_log.json"
+    simulate(
+        config,
+        runtime=10000,
+        logging_id="test_analyze",
+        random_seed="1",
+        output_event_log_file=event_log_file,
+    )
+
+    report = analyze(event_log_file, processes=1)
+    assert report["events"] > 16
+    for processes in [4, 16]:
+        assert analyze(event_log_file, processes=processes) == report
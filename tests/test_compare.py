@@ -0,0 +1,10 @@
+from pytest import approx
+
+from aggregated_event_data.compare import student_t_quantile
+
+
+def test_student_t_quantile():
+    # Two-sided 95% critical values
+    for df, t in [(1, 12.7062), (2, 4.3027), (3, 3.1824), (5, 2.5706), (30, 2.0423)]:
+        assert student_t_quantile(0.975, df) == approx(t, abs=1e-4)
+    assert student_t_quantile(0.025, 4) == approx(-2.7764, abs=1e-4)
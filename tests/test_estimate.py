@@ -0,0 +1,57 @@
+from aggregated_event_data.estimate import estimate, get_route_jobs
+
+
+def test_route_of_merged_split_lots():
+    """
+    Split lots that are merged again by their identifier continue as one lot.
+    """
+    lot_config = {
+        "id": "Lot0",
+        "steps": ["WT", "DB", "WB"],
+        "split": [{"after_step": "WT", "number_of_split_lots": 2}],
+        "merge": [{"after_step": "DB", "lot_identifiers": ["Lot0_0", "Lot0_1"]}],
+        "n_devices": 4,
+    }
+    route = get_route_jobs(lot_config, {"Lot0": 4})
+    assert route == [("WT", 1, 4), ("DB", 2, 2), ("WB", 1, 4)]
+
+    resources = [
+        {
+            "id": f"{step}1",
+            "step": step,
+            "mean_move": 0.5,
+            "mean_duration": 1,
+            "mean_breakdown": 5,
+            "mean_repair": 1,
+        }
+        for step in ["WT", "DB", "WB"]
+    ]
+    estimation = estimate(
+        {
+            "production_lots": [lot_config],
+            "production_resources": resources,
+            "packing_unit_size": 2,
+        }
+    )
+    assert estimation["resource_utilization"]["WB1"] > 0
+
+
+def test_route_of_merged_lots():
+    """
+    Lots merged into another lot do not continue, the devices are added to the other lot.
+    """
+    lot_configs = [
+        {
+            "id": lot_id,
+            "steps": ["DB", "WB"],
+            "merge": [{"after_step": "DB", "lot_identifiers": ["LotA", "LotB"]}],
+            "n_devices": 3,
+        }
+        for lot_id in ["LotA", "LotB"]
+    ]
+    lot_devices = {"LotA": 3, "LotB": 3}
+    assert get_route_jobs(lot_configs[0], lot_devices) == [
+        ("DB", 1, 3),
+        ("WB", 1, 6),
+    ]
+    assert get_route_jobs(lot_configs[1], lot_devices) == [("DB", 1, 3)]
@@ -0,0 +1,56 @@
+from json import load
+
+from aggregated_event_data.simulate import simulate
+
+
+def test_parallel_kitting_with_lead_time(tmp_path):
+    """
+    Resources of the same capability that wait for material at the same time share the
+    staged material lots, none of them waits for a lot that is not supplied anymore.
+    """
+    config = {
+        "production_lots": [
+            {
+                "id": f"Lot{i}",
+                "steps": ["DB"],
+                "required_material": {"DB": "DBM"},
+                "n_devices": 1,
+            }
+            for i in range(2)
+        ],
+        "production_resources": [
+            {
+                "id": identifier,
+                "step": "DB",
+                "mean_move": 0.5,
+                "mean_duration": 1,
+                "mean_breakdown": 5,
+                "mean_repair": 1,
+            }
+            for identifier in ["DB1", "DB2"]
+        ],
+        "material_lot_size": 2,
+        "material_lead_time": 3,
+        "packing_unit_size": 1,
+    }
+    for seed in range(1, 6):
+        event_log_file = tmp_path / f"event_log_{seed}.json"
+        kpis = simulate(
+            config,
+            runtime=1000,
+            logging_id="test_material_staging",
+            random_seed=str(seed),
+            output_event_log_file=event_log_file,
+        )
+        assert kpis["packed_devices"] == 2
+
+        with open(event_log_file) as f:
+            events = load(f)["events"]
+        materials = [
+            m
+            for e in events
+            if e["eventType"] == "Transformation"
+            for d in e["_devices"]
+            for m in d["materials"]
+        ]
+        assert sorted(materials) == ["DBM_0_Material0", "DBM_0_Material1"]
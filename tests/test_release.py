@@ -0,0 +1,71 @@
+import pytest
+
+from aggregated_event_data.simulate import simulate
+
+RESOURCES = [
+    {
+        "id": f"{step}1",
+        "step": step,
+        "mean_move": 0.5,
+        "mean_duration": 1,
+        "mean_breakdown": 5,
+        "mean_repair": 1,
+    }
+    for step in ["DB", "WB"]
+]
+
+
+def get_config(lots: list, wip_limit: int) -> dict:
+    return {
+        "production_lots": [
+            {
+                "id": lot_id,
+                "steps": ["DB", "WB"],
+                "merge": [{"after_step": "DB", "lot_identifiers": merged}],
+                "n_devices": n_devices,
+                "release_time": release_time,
+            }
+            for lot_id, n_devices, release_time, merged in lots
+        ],
+        "production_resources": RESOURCES,
+        "packing_unit_size": 1,
+        "release": {"wip_limit": wip_limit},
+    }
+
+
+def test_merge_group_larger_than_wip_limit(tmp_path):
+    config = get_config(
+        [("LotA", 3, 0, ["LotA", "LotB"]), ("LotB", 3, 0, ["LotA", "LotB"])],
+        wip_limit=4,
+    )
+    with pytest.raises(ValueError):
+        simulate(
+            config,
+            runtime=1000,
+            logging_id="test_release",
+            output_event_log_file=tmp_path / "event_log.json",
+        )
+
+
+def test_merge_groups_are_released_as_a_unit(tmp_path):
+    """
+    Lots of a merge group are not blocked by lots of another group that are released in between.
+    """
+    config = get_config(
+        [
+            ("LotA", 3, 0, ["LotA", "LotB"]),
+            ("LotC", 3, 1, ["LotC", "LotD"]),
+            ("LotB", 1, 2, ["LotA", "LotB"]),
+            ("LotD", 1, 3, ["LotC", "LotD"]),
+        ],
+        wip_limit=4,
+    )
+    kpis = simulate(
+        config,
+        runtime=1000,
+        logging_id="test_release",
+        random_seed="1",
+        output_event_log_file=tmp_path / "event_log.json",
+    )
+    assert kpis["released_lots"] == 4
+    assert kpis["packed_devices"] == 8
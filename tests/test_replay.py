@@ -0,0 +1,54 @@
+from json import load
+from pathlib import Path
+
+from aggregated_event_data.replay import compare_event_logs, replay
+from aggregated_event_data.simulate import simulate
+
+
+def test_replay_reproduces_event_log(tmp_path):
+    """
+    The event log written from a recorded trace is the same as the event log of the simulation.
+    """
+    with open(Path(__file__).parents[1] / "examples" / "example_1.json") as f:
+        config = load(f)
+
+    golden_event_log_file = tmp_path / "golden_event_log.json"
+    trace_file = tmp_path / "trace.json"
+    simulate(
+        config,
+        runtime=1000,
+        logging_id="test_replay",
+        random_seed="1",
+        output_event_log_file=golden_event_log_file,
+        spill_closed_entities=True,
+        trace_file=trace_file,
+    )
+    event_log_file = replay(trace_file, tmp_path / "event_log.json")
+
+    with open(event_log_file) as f:
+        event_log = load(f)
+    with open(golden_event_log_file) as f:
+        golden_event_log = load(f)
+    assert event_log == golden_event_log
+
+
+def test_golden_event_log(tmp_path):
+    """
+    Seeded runs reproduce their golden event log, a different run does not.
+    """
+    with open(Path(__file__).parents[1] / "examples" / "example_1.json") as f:
+        config = load(f)
+
+    event_log_files = {}
+    for name, seed in [("golden", "1"), ("same", "1"), ("other", "2")]:
+        event_log_files[name] = tmp_path / f"{name}_event_log.json"
+        simulate(
+            config,
+            runtime=1000,
+            logging_id="test_golden",
+            random_seed=seed,
+            output_event_log_file=event_log_files[name],
+        )
+
+    assert compare_event_logs(event_log_files["same"], event_log_files["golden"])
+    assert not compare_event_logs(event_log_files["other"], event_log_files["golden"])
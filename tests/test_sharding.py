@@ -0,0 +1,51 @@
+from json import load
+from pathlib import Path
+
+from aggregated_event_data.sharding import simulate_sharded
+
+
+def test_sharded_simulation(tmp_path):
+    """
+    A sharded run packs every device once, with its own material, and merges the event logs
+    of the areas into one time ordered event log.
+    """
+    with open(Path(__file__).parents[1] / "examples" / "example_areas_1.json") as f:
+        config = load(f)
+
+    event_log_file = tmp_path / "event_log.json"
+    kpis = simulate_sharded(
+        config,
+        runtime=1000,
+        logging_id="test_sharding",
+        random_seed="1",
+        n_areas=2,
+        processes=2,
+        output_event_log_file=event_log_file,
+    )
+    assert kpis["areas"] == 2
+
+    with open(event_log_file) as f:
+        events = load(f)["events"]
+
+    # Devices are created with the lots when they are released, before any step is executed
+    created = [
+        d["identifier"]
+        for e in events
+        if e.get("bizStep") == "creating_class_instance"
+        and e["quantity"]["class"][1] == "lotModel/"
+        for d in e["_devices"]
+    ]
+    packed = [d for e in events if e.get("bizStep") == "packing" for d in e["_devices"]]
+    assert len(created) == sum(r["n_devices"] for r in config["production_lots"])
+    assert sorted(d["identifier"] for d in packed) == sorted(created)
+    assert kpis["packed_devices"] == len(created)
+
+    # Each lot requires one material per device
+    materials = [m for d in packed for m in d["materials"]]
+    assert all(len(d["materials"]) == 1 for d in packed)
+    assert len(set(materials)) == len(materials)
+
+    timestamps = [e["timestamp"] for e in events]
+    assert timestamps == sorted(timestamps)
+    identifiers = [e["eventIdentifier"] for e in events]
+    assert len(set(identifiers)) == len(identifiers)
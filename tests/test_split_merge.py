@@ -0,0 +1,58 @@
+from json import load
+
+from aggregated_event_data.simulate import simulate
+
+RESOURCES = [
+    {
+        "id": f"{step}1",
+        "step": step,
+        "mean_move": 0.5,
+        "mean_duration": 1,
+        "mean_breakdown": 5,
+        "mean_repair": 1,
+    }
+    for step in ["WT", "DB", "WB"]
+]
+
+
+def test_merge_of_split_lots(tmp_path):
+    """
+    Lots that are split off can be merged again by their identifier.
+    """
+    config = {
+        "production_lots": [
+            {
+                "id": "Lot0",
+                "steps": ["WT", "DB", "WB"],
+                "split": [{"after_step": "WT", "number_of_split_lots": 2}],
+                "merge": [
+                    {"after_step": "DB", "lot_identifiers": ["Lot0_0", "Lot0_1"]}
+                ],
+                "n_devices": 4,
+            }
+        ],
+        "production_resources": RESOURCES,
+        "packing_unit_size": 2,
+    }
+    event_log_file = tmp_path / "event_log.json"
+    kpis = simulate(
+        config,
+        runtime=1000,
+        logging_id="test_split_merge",
+        random_seed="1",
+        output_event_log_file=event_log_file,
+    )
+
+    with open(event_log_file) as f:
+        event_log = load(f)
+    merges = [
+        e
+        for e in event_log["events"]
+        if e["eventType"] == "Aggregation"
+        and e["action"] == "ADD"
+        and e.get("bizStep") != "packing"
+    ]
+    assert len(merges) == 1
+    assert merges[0]["parentEntity"] == "Lot0_0"
+    assert merges[0]["childEntity"] == "Lot0_1"
+    assert kpis["packed_devices"] == 4
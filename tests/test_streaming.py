@@ -0,0 +1,111 @@
+import asyncio
+import socket
+import threading
+import time
+
+from json import dumps, loads
+
+from aggregated_event_data.streaming import EventStreamServer
+
+N_EVENTS = 10000
+# Seconds after which a client stops waiting for messages (the test fails instead of hanging)
+CLIENT_TIMEOUT = 10
+
+
+def connect(path: str, subscription) -> socket.socket:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(CLIENT_TIMEOUT)
+    client.connect(path)
+    client.sendall((dumps(subscription) + "\n").encode())
+    return client
+
+
+def receive(client: socket.socket, messages: list):
+    with client.makefile("rb") as f:
+        messages.extend(loads(line) for line in f)
+    client.close()
+
+
+def test_subscription_policies(tmp_path):
+    """
+    Subscribers that do not keep up with the events either get their matching events,
+    are told how many events were dropped or are disconnected when they overflow.
+    """
+    path = str(tmp_path / "stream.sock")
+    server = EventStreamServer(f"unix://{path}")
+    server.start()
+
+    subscriptions = {
+        "filter": {
+            "filter": {"eventType": "Transformation"},
+            "policy": "block",
+            "kpis": False,
+        },
+        "drop": {"policy": "drop", "queue_size": 10, "kpis": False},
+        "block": {
+            "policy": "block",
+            "queue_size": 10,
+            "overflow_size": 10,
+            "kpis": False,
+        },
+    }
+    clients = {name: connect(path, s) for name, s in subscriptions.items()}
+    while len(server.subscribers) < len(clients):
+        time.sleep(0.01)
+
+    # Large events, so that the clients (not reading yet) fall behind
+    for i in range(N_EVENTS):
+        server.publish(
+            {
+                "eventType": "Transformation" if i % 2 else "Object",
+                "timestamp": i,
+                "payload": "x" * 1000,
+            }
+        )
+    asyncio.run_coroutine_threadsafe(asyncio.sleep(0), server.loop).result()
+
+    messages = {name: [] for name in clients}
+    readers = [
+        threading.Thread(target=receive, args=(client, messages[name]))
+        for name, client in clients.items()
+    ]
+    for reader in readers:
+        reader.start()
+    server.close()
+    for reader in readers:
+        reader.join()
+
+    events = [m["event"] for m in messages["filter"] if m["kind"] == "event"]
+    assert len(events) == N_EVENTS // 2
+    assert all(e["eventType"] == "Transformation" for e in events)
+    assert messages["filter"][-1]["kind"] == "end"
+
+    n_events = sum(m["kind"] == "event" for m in messages["drop"])
+    n_dropped = sum(m["count"] for m in messages["drop"] if m["kind"] == "dropped")
+    assert n_dropped > 0
+    assert n_events + n_dropped == N_EVENTS
+    assert messages["drop"][-1]["kind"] == "end"
+
+    assert messages["block"][-1]["kind"] == "error"
+    assert len(messages["block"]) < N_EVENTS
+
+
+def test_invalid_subscriptions(tmp_path):
+    path = str(tmp_path / "stream.sock")
+    server = EventStreamServer(f"unix://{path}")
+    server.start()
+    try:
+        for subscription in [
+            {"queue_size": 0},
+            {"queue_size": -1},
+            {"policy": "block", "overflow_size": 0},
+            {"policy": "wait"},
+            {"filter": ["eventType"]},
+            [],
+        ]:
+            messages = []
+            receive(connect(path, subscription), messages)
+            assert [m["kind"] for m in messages] == ["error"]
+        assert not server.subscribers
+    finally:
+        server.close()